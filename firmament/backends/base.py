@@ -193,7 +193,13 @@ class BaseBackend:
         Retrieves content into local path "disk_path".
         """
         with open(disk_path, "wb") as local_fh:
-            self.remote_read_io(self.remote_content_path(sha256sum), local_fh)
+            self.content_download_io(sha256sum, local_fh)
+
+    def content_download_io(self, sha256sum: str, target_handle: BinaryIO):
+        """
+        Retrieves content into the passed (already-open) file handle.
+        """
+        self.remote_read_io(self.remote_content_path(sha256sum), target_handle)
 
     def content_delete(self, sha256sum: str):
         """
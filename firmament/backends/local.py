@@ -109,10 +109,12 @@ class LocalBackend(BaseBackend):
         Works out storage path for given sha256sum.
 
         As we're on an actual filesystem, use a 3-char prefix so the top level has a max
-        of 4096 entries.
+        of 4096 entries. It is taken after any algorithm prefix (like "blake3:"), which
+        unencrypted identifiers keep.
         """
         cryptsum = self.encryptor.encrypt_identifier(sha256sum)
-        return str(self.content_root / cryptsum[:3] / cryptsum)
+        shard = cryptsum.rpartition(":")[2][:3]
+        return str(self.content_root / shard / cryptsum)
 
     def remote_database_path(self, db_name: str) -> str:
         """
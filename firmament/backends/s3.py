@@ -192,10 +192,13 @@ class S3Backend(BaseBackend):
         """
         Works out storage path for given sha256sum.
 
-        Uses a 3-char prefix so listing has a max of 4096 entries per prefix.
+        Uses a 3-char prefix so listing has a max of 4096 entries per prefix. It is
+        taken after any algorithm prefix (like "blake3:"), which unencrypted identifiers
+        keep.
         """
         cryptsum = self.encryptor.encrypt_identifier(sha256sum)
-        return f"content/{cryptsum[:3]}/{cryptsum}"
+        shard = cryptsum.rpartition(":")[2][:3]
+        return f"content/{shard}/{cryptsum}"
 
     def remote_database_path(self, db_name: str) -> str:
         """
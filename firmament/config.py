@@ -6,12 +6,20 @@ from pydantic import AfterValidator, BaseModel
 from pydantic.types import PathType
 
 from firmament.backends.base import BaseBackend
-from firmament.datastore import ContentBackends, FileVersion, LocalVersion, PathRequest
+from firmament.datastore import (
+    ContentBackends,
+    FileVersion,
+    HashCache,
+    LocalVersion,
+    PathRequest,
+)
+from firmament.utils import HashAlgorithm, check_hash_algorithm
 
 DirectoryPath = Annotated[
     Path, AfterValidator(lambda v: v.expanduser()), PathType("dir")
 ]
 FilePath = Annotated[Path, AfterValidator(lambda v: v.expanduser()), PathType("file")]
+AvailableHashAlgorithm = Annotated[HashAlgorithm, AfterValidator(check_hash_algorithm)]
 
 
 class BackendSchema(BaseModel):
@@ -30,6 +38,7 @@ class ConfigSchema(BaseModel):
 
     backends: dict[str, BackendSchema]
     paths: dict[str, PathSchema] = {}
+    hash_algorithm: AvailableHashAlgorithm = "sha256"
 
 
 class Config:
@@ -49,6 +58,7 @@ class Config:
         # Read main config in
         with open(self.config_path) as fh:
             self.config_data = ConfigSchema(**yaml.safe_load(fh.read()))
+        self.hash_algorithm = self.config_data.hash_algorithm
 
         # Set up backend class instances
         self.backends = {}
@@ -67,6 +77,20 @@ class Config:
         self.content_backends = ContentBackends(
             self.datastore_path / "content_backends"
         )
+        self.hash_cache = HashCache(self.datastore_path / "hash_cache")
+
+    @property
+    def version_counter(self) -> int:
+        """
+        A number that increases whenever file_versions, local_versions, path_requests or
+        content_backends are changed, by this or any other process.
+        """
+        return (
+            self.file_versions.version()
+            + self.local_versions.version()
+            + self.path_requests.version()
+            + self.content_backends.version()
+        )
 
     def disk_path(self, path: str) -> Path:
         """
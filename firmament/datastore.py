@@ -1,6 +1,9 @@
-from collections.abc import Iterator
-from pathlib import Path
-from typing import Generic, TypeVar, cast
+import os
+import sys
+import threading
+from collections.abc import Iterable, Iterator
+from pathlib import Path, PurePosixPath
+from typing import Generic, Literal, TypeVar, cast
 
 import lmdb
 import msgpack
@@ -9,12 +12,56 @@ from firmament.constants import DELETED_CONTENT_HASH
 from firmament.types import (
     FileVersionData,
     FileVersionMeta,
+    HashCacheData,
     LocalVersionData,
     PathRequestType,
 )
+from firmament.utils import HashAlgorithm, hash_algorithm_of
 
 T = TypeVar("T")
 
+Durability = Literal["strict", "relaxed"]
+
+# msgpack.packb() builds a new Packer per call; reusing one (per thread, as they
+# hold a buffer) is much faster for the small values we store
+_packers = threading.local()
+
+
+def _decode_key(key: bytes) -> str:
+    """
+    Decodes a stored key for one of the cached indexes, interning it.
+
+    The same paths and hashes come out of several indexes and are compared against each
+    other on every TUI refresh; interned strings compare equal by identity. One-off
+    iteration isn't worth the extra cost of interning.
+    """
+    return sys.intern(key.decode("utf-8"))
+
+
+def _records(txn: lmdb.Transaction) -> Iterator[tuple[bytes, bytes]]:
+    """
+    Iterates over every (key, value) in the transaction's database.
+
+    We never open transactions with buffers=True, so these are always bytes, not the
+    memoryviews lmdb's types also allow.
+    """
+    return cast(Iterator[tuple[bytes, bytes]], iter(txn.cursor()))
+
+
+def _keys(txn: lmdb.Transaction) -> Iterator[bytes]:
+    """
+    Iterates over every key in the transaction's database, as bytes.
+    """
+    return cast(Iterator[bytes], txn.cursor().iternext(values=False))
+
+
+def _packb(value) -> bytes:
+    try:
+        packer = _packers.packer
+    except AttributeError:
+        packer = _packers.packer = msgpack.Packer()
+    return packer.pack(value)
+
 
 class DiskDatastore(Generic[T]):
     """
@@ -23,38 +70,130 @@ class DiskDatastore(Generic[T]):
     Keys are strings (encoded as UTF-8), values are serialized with msgpack.
     """
 
-    def __init__(self, path: Path, map_size: int = 1024 * 1024 * 1024):
+    # If nonzero, set() and delete() are buffered in memory and committed
+    # together once this many bytes are pending (or on flush()/close(), or any
+    # read other than a single-key lookup). Buffered writes are not visible to
+    # other processes until then, so this is only for data like caches.
+    max_pending_bytes: int = 0
+
+    # "strict" fsyncs every commit. "relaxed" leaves flushing to the OS, so a
+    # system crash (not just a process one) can lose the last few commits,
+    # though never corrupt the database.
+    durability: Durability = "strict"
+
+    def __init__(
+        self,
+        path: Path,
+        map_size: int = 1024 * 1024 * 1024,
+        max_pending_bytes: int | None = None,
+        durability: Durability | None = None,
+    ):
         """
         Initialize the datastore.
 
         Args:
             path: Path to the LMDB environment directory.
             map_size: Maximum size of the database in bytes (default 1GB).
+            max_pending_bytes: Overrides the class's write buffering threshold.
+            durability: Overrides the class's durability ("strict" or "relaxed").
         """
         self.path = path
         path.mkdir(parents=True, exist_ok=True)
-        self.env = lmdb.open(str(path), map_size=map_size)
+        if durability is not None:
+            self.durability = durability
+        if self.durability not in ("strict", "relaxed"):
+            raise ValueError(f"Unknown durability {self.durability!r}")
+        relaxed = self.durability == "relaxed"
+        self.env = lmdb.open(
+            str(path), map_size=map_size, sync=not relaxed, metasync=not relaxed
+        )
+        if max_pending_bytes is not None:
+            self.max_pending_bytes = max_pending_bytes
+        # Buffered writes, as packed values or None for deletions
+        self._pending: dict[str, bytes | None] = {}
+        self._pending_bytes = 0
+        self._pending_lock = threading.Lock()
+        # (transaction id, keys) for keyset(); any write bumps the LMDB txn id
+        self._keyset: tuple[int, frozenset[str]] | None = None
 
     def _validate_key(self, key: str):
         pass
 
+    def _pack(self, value: T) -> bytes:
+        """
+        Serializes a value for storage.
+
+        Subclasses may override this (and _unpack) to change the value encoding.
+        """
+        return _packb(value)
+
+    def _unpack(self, data: bytes) -> T:
+        return msgpack.unpackb(data)
+
+    def _begin(self, write: bool = False) -> lmdb.Transaction:
+        """
+        Starts a transaction, committing any buffered writes first so it sees them.
+        """
+        if self._pending:
+            self.flush()
+        return self.env.begin(write=write)
+
+    def _get_packed(self, key: str) -> bytes | None:
+        """
+        Returns the packed value for key (including buffered writes), or None.
+        """
+        if self._pending:
+            with self._pending_lock:
+                if key in self._pending:
+                    return self._pending[key]
+        # Not buffers=True: our values are small enough that building a
+        # memoryview into the map costs more than copying them out
+        with self.env.begin() as txn:
+            return txn.get(key.encode("utf-8"))
+
+    def _buffer(self, key: str, packed: bytes | None):
+        with self._pending_lock:
+            self._pending[key] = packed
+            self._pending_bytes += len(key) + (len(packed) if packed else 0)
+            if self._pending_bytes < self.max_pending_bytes:
+                return
+        self.flush()
+
+    def flush(self) -> None:
+        """
+        Commits any buffered writes in a single transaction.
+        """
+        with self._pending_lock:
+            if not self._pending:
+                return
+            with self.env.begin(write=True) as txn:
+                for key, packed in self._pending.items():
+                    if packed is None:
+                        txn.delete(key.encode("utf-8"))
+                    else:
+                        txn.put(key.encode("utf-8"), packed)
+            self._pending = {}
+            self._pending_bytes = 0
+
     def get(self, key: str, default: T | None = None) -> T | None:
         """
         Get a value by key, returning default if not found.
         """
-        with self.env.begin() as txn:
-            value = txn.get(key.encode("utf-8"))
-            if value is None:
-                return default
-            return cast(T, msgpack.unpackb(value))
+        value = self._get_packed(key)
+        if value is None:
+            return default
+        return self._unpack(value)
 
     def set(self, key: str, value: T) -> None:
         """
         Set a value and persist to disk.
         """
         self._validate_key(key)
-        with self.env.begin(write=True) as txn:
-            txn.put(key.encode("utf-8"), msgpack.packb(value))
+        if self.max_pending_bytes:
+            self._buffer(key, self._pack(value))
+            return
+        with self._begin(write=True) as txn:
+            txn.put(key.encode("utf-8"), self._pack(value))
 
     def delete(self, key: str) -> None:
         """
@@ -63,16 +202,45 @@ class DiskDatastore(Generic[T]):
         Raises KeyError if not found.
         """
         self._validate_key(key)
-        with self.env.begin(write=True) as txn:
+        if self.max_pending_bytes:
+            if key not in self:
+                raise KeyError(key)
+            self._buffer(key, None)
+            return
+        with self._begin(write=True) as txn:
             if not txn.delete(key.encode("utf-8")):
                 raise KeyError(key)
 
+    def set_many(self, values: dict[str, T]) -> None:
+        """
+        Set several values in a single write transaction.
+        """
+        if not values:
+            return
+        for key in values:
+            self._validate_key(key)
+        # Writing in key order keeps each B-tree page hot while it's filled
+        encoded = sorted(
+            (key.encode("utf-8"), self._pack(value)) for key, value in values.items()
+        )
+        with self._begin(write=True) as txn:
+            txn.cursor().putmulti(encoded)
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        """
+        Delete several keys in a single write transaction, ignoring any that are not
+        present.
+        """
+        with self._begin(write=True) as txn:
+            for key in keys:
+                self._validate_key(key)
+                txn.delete(key.encode("utf-8"))
+
     def __getitem__(self, key: str) -> T:
-        with self.env.begin() as txn:
-            value = txn.get(key.encode("utf-8"))
-            if value is None:
-                raise KeyError(key)
-            return cast(T, msgpack.unpackb(value))
+        value = self._get_packed(key)
+        if value is None:
+            raise KeyError(key)
+        return self._unpack(value)
 
     def __setitem__(self, key: str, value: T) -> None:
         self.set(key, value)
@@ -81,53 +249,90 @@ class DiskDatastore(Generic[T]):
         self.delete(key)
 
     def __contains__(self, key: str) -> bool:
+        if self._pending:
+            with self._pending_lock:
+                if key in self._pending:
+                    return self._pending[key] is not None
+        # Positioning a cursor answers this without copying the value out
         with self.env.begin() as txn:
-            return txn.get(key.encode("utf-8")) is not None
+            return txn.cursor().set_key(key.encode("utf-8"))
 
     def keys(self) -> Iterator[str]:
-        with self.env.begin() as txn:
-            cursor = txn.cursor()
-            for key, _ in cursor:
+        with self._begin() as txn:
+            for key in _keys(txn):
                 yield key.decode("utf-8")
 
+    def keyset(self) -> frozenset[str]:
+        """
+        Returns all keys as a frozenset.
+
+        The result is cached against the LMDB transaction ID, so it is reused until the
+        database is next written to (by any process).
+        """
+        with self._begin() as txn:
+            cached = self._keyset
+            if cached is None or cached[0] != txn.id():
+                cached = (
+                    txn.id(),
+                    frozenset(_decode_key(key) for key in _keys(txn)),
+                )
+                self._keyset = cached
+            return cached[1]
+
+    def version(self) -> int:
+        """
+        Returns the LMDB transaction ID, which increases whenever the database is
+        written to (by any process).
+        """
+        with self._begin() as txn:
+            return txn.id()
+
     def values(self) -> Iterator[T]:
-        with self.env.begin() as txn:
-            cursor = txn.cursor()
-            for _, value in cursor:
-                yield cast(T, msgpack.unpackb(value))
+        with self._begin() as txn:
+            for _, value in _records(txn):
+                yield self._unpack(value)
 
     def items(self) -> Iterator[tuple[str, T]]:
-        with self.env.begin() as txn:
-            cursor = txn.cursor()
-            for key, value in cursor:
-                yield key.decode("utf-8"), cast(T, msgpack.unpackb(value))
+        with self._begin() as txn:
+            for key, value in _records(txn):
+                yield key.decode("utf-8"), self._unpack(value)
 
     def all(self) -> dict[str, T]:
         result: dict[str, T] = {}
-        with self.env.begin() as txn:
-            cursor = txn.cursor()
-            for key, value in cursor:
-                result[key.decode("utf-8")] = cast(T, msgpack.unpackb(value))
+        with self._begin() as txn:
+            for key, value in _records(txn):
+                result[key.decode("utf-8")] = self._unpack(value)
         return result
 
     def set_all(self, value: dict[str, T]):
         """
         Overwrite the entire database to match value.
         """
-        with self.env.begin(write=True) as txn:
+        for key in value:
+            self._validate_key(key)
+        # Sorted input lets LMDB append to the end of the B-tree rather than
+        # searching and splitting pages for each key
+        encoded = sorted(
+            (key.encode("utf-8"), self._pack(val)) for key, val in value.items()
+        )
+        with self._begin(write=True) as txn:
             txn.drop(self.env.open_db(), delete=False)
-            for key, val in value.items():
-                self._validate_key(key)
-                txn.put(key.encode("utf-8"), msgpack.packb(val))
+            # The database is empty and the keys unique and sorted, so every key
+            # can go on the end
+            txn.cursor().putmulti(encoded, append=True)
 
     def __len__(self) -> int:
-        with self.env.begin() as txn:
+        with self._begin() as txn:
             return txn.stat()["entries"]
 
     def close(self) -> None:
+        self.flush()
         self.env.close()
 
 
+_PACKED_NO_CONTENT_HASH = msgpack.packb("content_hash") + msgpack.packb(None)
+
+
 class LocalVersion(DiskDatastore[LocalVersionData]):
     """
     Storage of LocalVersions (what things we have on-disk in our checkout)
@@ -137,26 +342,85 @@ class LocalVersion(DiskDatastore[LocalVersionData]):
         if not key.startswith("/"):
             raise ValueError("LocalVersion paths must start with /")
 
+    def set_hashed(self, values: dict[str, LocalVersionData]) -> int:
+        """
+        Writes hashed LocalVersions in a single transaction, skipping any whose stored
+        entry no longer has the same mtime and size (or has gone), as the file was
+        changed after it was hashed.
+
+        Returns how many were written.
+        """
+        written = 0
+        with self._begin(write=True) as txn:
+            for key, value in sorted(values.items()):
+                self._validate_key(key)
+                encoded_key = key.encode("utf-8")
+                current = cast(bytes | None, txn.get(encoded_key))
+                if current is None:
+                    continue
+                current_value = self._unpack(current)
+                if (
+                    current_value["mtime"] != value["mtime"]
+                    or current_value["size"] != value["size"]
+                ):
+                    continue
+                txn.put(encoded_key, self._pack(value))
+                written += 1
+        return written
+
+    # (transaction id, index) for content_index()
+    _content_index: tuple[int, dict[str, tuple[str, LocalVersionData]]] | None = None
+
+    def content_index(self) -> dict[str, tuple[str, LocalVersionData]]:
+        """
+        Returns {content hash: (path, data)} for the first path with each hash.
+
+        Like keyset(), this is cached until the database is next written to.
+        """
+        with self._begin() as txn:
+            cached = self._content_index
+            if cached is None or cached[0] != txn.id():
+                index: dict[str, tuple[str, LocalVersionData]] = {}
+                for key, value in _records(txn):
+                    data = self._unpack(value)
+                    if data["content_hash"] is not None:
+                        index.setdefault(data["content_hash"], (_decode_key(key), data))
+                cached = (txn.id(), index)
+                self._content_index = cached
+            return cached[1]
+
     def by_content_hash(self, content_hash: str) -> tuple[str, LocalVersionData]:
         """
         Returns the first path key that has this content.
         """
-        for path, meta in self.items():
-            if meta["content_hash"] == content_hash:
-                return path, meta
-        raise KeyError(f"No entry with content hash {content_hash}")
+        try:
+            return self.content_index()[content_hash]
+        except KeyError:
+            raise KeyError(f"No entry with content hash {content_hash}")
 
-    def all_content_hashes(self) -> set[str]:
-        result = set()
-        for data in self.values():
-            if data["content_hash"] is not None:
-                result.add(data["content_hash"])
-        return result
+    # (content index it was built from, hashes) for all_content_hashes()
+    _content_hashes: tuple[dict, frozenset[str]] | None = None
+
+    def all_content_hashes(self) -> frozenset[str]:
+        """
+        Returns every content hash we have locally.
+
+        Built once per content_index(), so it is shared until the next write.
+        """
+        index = self.content_index()
+        cached = self._content_hashes
+        if cached is None or cached[0] is not index:
+            cached = (index, frozenset(index))
+            self._content_hashes = cached
+        return cached[1]
 
     def without_content_hashes(self) -> Iterator[str]:
-        for path, data in self.items():
-            if data["content_hash"] is None:
-                yield path
+        # LocalVersion values contain no free-form strings, so the packed
+        # "content_hash: None" pair can be spotted without unpacking each value
+        with self._begin() as txn:
+            for key, value in _records(txn):
+                if _PACKED_NO_CONTENT_HASH in value:
+                    yield key.decode("utf-8")
 
     def not_in_file_versions(
         self, file_versions: "FileVersion"
@@ -164,14 +428,23 @@ class LocalVersion(DiskDatastore[LocalVersionData]):
         """
         Returns all LocalVersions which have a content_hash but do not have a matching
         FileVersion (i.e. there is no FileVersion with their path and contenthash)
+
+        Both databases are read in one transaction each for the whole walk, rather than
+        a FileVersion lookup transaction per LocalVersion.
         """
-        for path, local_data in self.items():
-            content_hash = local_data["content_hash"]
-            if content_hash is None:
-                continue
-            file_version_data = file_versions.get(path)
-            if file_version_data is None or content_hash not in file_version_data:
-                yield path, local_data
+        with self._begin() as txn, file_versions._begin() as file_txn:
+            for key, value in _records(txn):
+                if _PACKED_NO_CONTENT_HASH in value:
+                    continue
+                local_data = self._unpack(value)
+                content_hash = local_data["content_hash"]
+                if content_hash is None:
+                    continue
+                file_version_value = cast(bytes | None, file_txn.get(key))
+                if file_version_value is None or content_hash not in (
+                    file_versions._unpack(file_version_value)
+                ):
+                    yield key.decode("utf-8"), local_data
 
 
 class FileVersion(DiskDatastore[FileVersionData]):
@@ -181,6 +454,11 @@ class FileVersion(DiskDatastore[FileVersionData]):
     Path is the overall key, then the value is a dict of {content_hash: meta}
     """
 
+    # (transaction id, index) for most_recent_index()
+    _most_recent_index: (
+        tuple[int, dict[str, tuple[str | None, FileVersionMeta | None]]] | None
+    ) = None
+
     def _validate_key(self, key: str):
         if not key.startswith("/"):
             raise ValueError("FileVersion paths must start with /")
@@ -200,19 +478,74 @@ class FileVersion(DiskDatastore[FileVersionData]):
         """
         Returns the most recent content hash and its meta for a given path.
         """
-        try:
-            candidates = list(self[path].items())
-            candidates.sort(key=lambda v: v[1]["mtime"], reverse=True)
-            return candidates[0]
-        except (KeyError, IndexError):
-            return None, None
+        return self._most_recent(self.get(path, default={}) or {})
+
+    @staticmethod
+    def _most_recent(
+        path_value: FileVersionData,
+    ) -> tuple[str | None, FileVersionMeta | None]:
+        if len(path_value) == 1:
+            # Most paths only ever have had one content
+            for item in path_value.items():
+                return item
+        # A plain loop (keeping the first of equal mtimes, as max() would) avoids
+        # a key-function call per entry; this runs for every path on each index
+        best: tuple[str | None, FileVersionMeta | None] = (None, None)
+        best_mtime = None
+        for item in path_value.items():
+            mtime = item[1]["mtime"]
+            if best_mtime is None or mtime > best_mtime:
+                best = item
+                best_mtime = mtime
+        return best
+
+    def most_recent_index(
+        self,
+    ) -> dict[str, tuple[str | None, FileVersionMeta | None]]:
+        """
+        Returns {path: (content hash, meta)} of the most recent content for every path,
+        in path order.
+
+        Like keyset(), this is cached until the database is next written to.
+        """
+        with self._begin() as txn:
+            cached = self._most_recent_index
+            if cached is None or cached[0] != txn.id():
+                # This walks every path, so the per-row calls are bound up front
+                # (and no typing.cast(), which is a real call at runtime)
+                unpack = self._unpack
+                most_recent = self._most_recent
+                cached = (
+                    txn.id(),
+                    {
+                        _decode_key(key): most_recent(unpack(value))
+                        for key, value in _records(txn)
+                    },
+                )
+                self._most_recent_index = cached
+            return cached[1]
+
+    def paths_missing_locally(self, local_versions: LocalVersion) -> Iterator[str]:
+        """
+        Returns paths that have a FileVersion but no LocalVersion.
+
+        Both databases are sorted by key, so this walks their cursors side by side
+        rather than building a set of every path.
+        """
+        with self._begin() as txn, local_versions._begin() as local_txn:
+            local_keys = _keys(local_txn)
+            local_key = next(local_keys, None)
+            for key in _keys(txn):
+                while local_key is not None and local_key < key:
+                    local_key = next(local_keys, None)
+                if local_key != key:
+                    yield key.decode("utf-8")
 
     def deleted_paths(self) -> Iterator[str]:
         """
         Returns paths where the most recent content hash is DELETED_CONTENT_HASH.
         """
-        for path in self.keys():
-            most_recent, _ = self.most_recent_content(path)
+        for path, (most_recent, _) in self.most_recent_index().items():
             if most_recent == DELETED_CONTENT_HASH:
                 yield path
 
@@ -222,25 +555,187 @@ class PathRequest(DiskDatastore[PathRequestType]):
     Storage of path requests (how we should download/upload a path or not)
     """
 
+    # Default is on-demand (to avoid mass downloads on new checkout)
+    default: PathRequestType = "on-demand"
+
     def _validate_key(self, key: str):
         if not key.startswith("/"):
             raise ValueError("PathRequest paths must start with /")
 
+    # (transaction id, requests) for all_cached()
+    _all_cached: tuple[int, dict[str, PathRequestType]] | None = None
+
+    # How many resolve_status() answers to remember per version of the requests
+    max_resolved_cache = 4096
+    # (requests dict they were resolved against, {path: status})
+    _resolved: tuple[dict, dict[str, PathRequestType]] | None = None
+
+    def all_cached(self) -> dict[str, PathRequestType]:
+        """
+        Returns all path requests as a dict, which callers must not modify.
+
+        Like keyset(), this is cached until the database is next written to. There are
+        usually only a handful of requests, so this is cheap to hold.
+        """
+        with self._begin() as txn:
+            cached = self._all_cached
+            if cached is None or cached[0] != txn.id():
+                cached = (
+                    txn.id(),
+                    {
+                        _decode_key(key): self._unpack(value)
+                        for key, value in _records(txn)
+                    },
+                )
+                self._all_cached = cached
+            return cached[1]
+
     def resolve_status(self, path: str) -> PathRequestType:
         """
         Tries the path and each of its parents until a status is found.
         """
-        path_obj = Path(path)
-        while path_obj != path_obj.parent:
-            path_config = self.get(str(path_obj))
+        requests = self.all_cached()
+        # Answers are remembered until the requests change, as the same paths
+        # tend to be asked about repeatedly (e.g. every missing file each step)
+        resolved = self._resolved
+        if resolved is None or resolved[0] is not requests:
+            resolved = self._resolved = (requests, {})
+        status = resolved[1].get(path)
+        if status is not None:
+            return status
+        status = self.default
+        parent = str(PurePosixPath(path))
+        # Stops before the root itself, which is never consulted
+        while parent != "/":
+            path_config = requests.get(parent)
             if path_config is not None:
-                return path_config
-            path_obj = path_obj.parent
-        # Default is on-demand (to avoid mass downloads on new checkout)
-        return "on-demand"
+                status = path_config
+                break
+            parent = parent.rpartition("/")[0] or "/"
+        if len(resolved[1]) >= self.max_resolved_cache:
+            resolved[1].clear()
+        resolved[1][path] = status
+        return status
+
+
+# Prefix for ContentBackends values in the newline format. Values without it are
+# msgpack, as they used to be; a msgpack list or nil never starts with this byte.
+_NEWLINE_FORMAT = b"\x00"
 
 
 class ContentBackends(DiskDatastore[list[str]]):
     """
     Storage of what backend names each content hash is on.
+
+    Values are stored as the backend names each followed by a newline, rather than
+    msgpack, which is quicker to build for the whole table on every upload pass and lets
+    backends be counted without decoding. Backend names cannot contain newlines.
     """
+
+    # (transaction id, counts) for backend_counts()
+    _backend_counts: tuple[int, dict[str, int]] | None = None
+
+    def _pack(self, value: list[str]) -> bytes:
+        return _NEWLINE_FORMAT + "".join(f"{name}\n" for name in value).encode("utf-8")
+
+    def _unpack(self, data: bytes) -> list[str]:
+        if not data.startswith(_NEWLINE_FORMAT):
+            # Written before the newline encoding; replaced on the next set_all()
+            return super()._unpack(data) or []
+        return data[1:].decode("utf-8").split("\n")[:-1]
+
+    def _count(self, data: bytes) -> int:
+        if not data.startswith(_NEWLINE_FORMAT):
+            return len(super()._unpack(data) or ())
+        return data.count(b"\n")
+
+    def backend_counts(self) -> dict[str, int]:
+        """
+        Returns {content hash: number of backends it is on}.
+
+        Like keyset(), this is cached until the database is next written to.
+        """
+        with self._begin() as txn:
+            cached = self._backend_counts
+            if cached is None or cached[0] != txn.id():
+                cached = (
+                    txn.id(),
+                    {
+                        _decode_key(key): self._count(value)
+                        for key, value in _records(txn)
+                    },
+                )
+                self._backend_counts = cached
+            return cached[1]
+
+
+class HashCache(DiskDatastore[HashCacheData]):
+    """
+    Storage of known content hashes for on-disk files, keyed by device and inode.
+
+    An entry is only valid while the file's size and mtime (in nanoseconds) still match,
+    letting renames and re-scans of unchanged files skip re-hashing. Hashes from a
+    different algorithm than the one asked for only match if the file was downloaded as
+    that content, as the archive already knows it by that hash.
+
+    Losing recent entries only costs a re-hash, so writes are buffered and not fsynced.
+    """
+
+    max_pending_bytes = 256 * 1024
+    durability = "relaxed"
+
+    @staticmethod
+    def stat_key(stat_result: os.stat_result) -> str:
+        """
+        Returns the key a file's entry is stored under.
+        """
+        return f"{stat_result.st_dev}:{stat_result.st_ino}"
+
+    def get_hash(
+        self, stat_result: os.stat_result, algorithm: HashAlgorithm = "sha256"
+    ) -> str | None:
+        """
+        Returns the known content hash for the file, if it is unchanged and was either
+        hashed with the given algorithm or downloaded.
+        """
+        data = self.get(self.stat_key(stat_result))
+        if (
+            data is None
+            or data["size"] != stat_result.st_size
+            or data["mtime_ns"] != stat_result.st_mtime_ns
+        ):
+            return None
+        # Entries written before these were recorded have neither
+        if data.get("algorithm") != algorithm and not data.get("downloaded"):
+            return None
+        return data["content_hash"]
+
+    def set_hash(
+        self,
+        stat_result: os.stat_result,
+        content_hash: str,
+        downloaded: bool = False,
+    ):
+        """
+        Records the content hash for the file in its current state.
+
+        Pass downloaded=True if the file was written from the archive's copy of that
+        content, so the hash is kept whatever algorithm we would hash it with.
+        """
+        self.set(
+            self.stat_key(stat_result),
+            {
+                "size": stat_result.st_size,
+                "mtime_ns": stat_result.st_mtime_ns,
+                "algorithm": hash_algorithm_of(content_hash),
+                "downloaded": downloaded,
+                "content_hash": content_hash,
+            },
+        )
+
+    def prune(self, live_keys: set[str]):
+        """
+        Removes entries for every file whose stat_key() is not in live_keys, which must
+        cover all files under the root (so, come from a full scan).
+        """
+        self.delete_many([key for key in self.keys() if key not in live_keys])
@@ -1,7 +1,10 @@
 import base64
+import functools
 import io
 import os
 import struct
+import threading
+from collections import deque
 from typing import BinaryIO
 
 from cryptography.hazmat.primitives import hashes
@@ -11,54 +14,74 @@ from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from firmament.encryptors.base import BaseEncryptor
 
 
-class _EncryptingStream(io.RawIOBase):
+class _ChunkedStream(io.RawIOBase):
     """
-    A streaming wrapper that encrypts file content in chunks using AES-GCM.
+    Base for streams that produce their output a chunk at a time.
 
-    Each chunk is prefixed with: [4-byte length][12-byte nonce][ciphertext+tag]
+    Chunks are served through a memoryview cursor, so reads slice them without copying
+    and only one chunk is ever held in memory.
     """
 
-    def __init__(self, source: BinaryIO, aesgcm: AESGCM, chunk_size: int):
+    def __init__(self, source: BinaryIO):
         self._fh = source
-        self._aesgcm = aesgcm
-        self._chunk_size = chunk_size
-        self._buffer = b""
+        self._pending: deque[memoryview] = deque()
         self._eof = False
 
-    def _encrypt_chunk(self) -> bytes:
-        plaintext = self._fh.read(self._chunk_size)
-        if not plaintext:
-            self._eof = True
-            return b""
-
-        nonce = os.urandom(AESEncryptor.NONCE_SIZE)
-        ciphertext = self._aesgcm.encrypt(nonce, plaintext, associated_data=None)
-        # Prefix with length so decoder knows chunk boundaries
-        chunk_data = nonce + ciphertext
-        return struct.pack(">I", len(chunk_data)) + chunk_data
+    def _next_chunk(self) -> list[bytes]:
+        """
+        Returns the next pieces of output, or an empty list at end of stream.
+        """
+        raise NotImplementedError()
+
+    def _take(self, size: int) -> memoryview | None:
+        """
+        Returns up to size bytes of the current chunk, fetching the next one if needed,
+        or None at end of stream.
+        """
+        while not self._pending:
+            if self._eof:
+                return None
+            pieces = self._next_chunk()
+            if not pieces:
+                self._eof = True
+                return None
+            self._pending.extend(memoryview(piece) for piece in pieces if piece)
+        view = self._pending[0]
+        if size < 0 or size >= len(view):
+            return self._pending.popleft()
+        self._pending[0] = view[size:]
+        return view[:size]
 
     def read(self, size: int = -1) -> bytes:
-        if size == -1:
+        if size is None or size < 0:
             # Read all remaining
-            while not self._eof:
-                self._buffer += self._encrypt_chunk()
-            result = self._buffer
-            self._buffer = b""
-            return result
-
-        while len(self._buffer) < size and not self._eof:
-            self._buffer += self._encrypt_chunk()
-
-        result = self._buffer[:size]
-        self._buffer = self._buffer[size:]
-        return result
+            parts = []
+            while (view := self._take(-1)) is not None:
+                parts.append(view)
+            return b"".join(parts)
+
+        parts = []
+        remaining = size
+        while remaining > 0 and (view := self._take(remaining)) is not None:
+            parts.append(view)
+            remaining -= len(view)
+        if len(parts) == 1:
+            return bytes(parts[0])
+        return b"".join(parts)
 
     def readinto(self, b):  # type: ignore[override]
-        data = self.read(len(b))
-        b[: len(data)] = data
-        return len(data)
+        target = memoryview(b).cast("B")
+        written = 0
+        while written < len(target):
+            view = self._take(len(target) - written)
+            if view is None:
+                break
+            target[written : written + len(view)] = view
+            written += len(view)
+        return written
 
     def close(self):
+        self._pending.clear()
         self._fh.close()
         super().close()
 
@@ -72,7 +95,32 @@ class _EncryptingStream(io.RawIOBase):
         return False
 
 
-class _DecryptingStream(io.RawIOBase):
+class _EncryptingStream(_ChunkedStream):
+    """
+    A streaming wrapper that encrypts file content in chunks using AES-GCM.
+
+    Each chunk is prefixed with: [4-byte length][12-byte nonce][ciphertext+tag]
+    """
+
+    def __init__(self, source: BinaryIO, aesgcm: AESGCM, chunk_size: int):
+        super().__init__(source)
+        self._aesgcm = aesgcm
+        self._chunk_size = chunk_size
+
+    def _next_chunk(self) -> list[bytes]:
+        plaintext = self._fh.read(self._chunk_size)
+        if not plaintext:
+            return []
+
+        nonce = os.urandom(AESEncryptor.NONCE_SIZE)
+        ciphertext = self._aesgcm.encrypt(nonce, plaintext, associated_data=None)
+        # Prefix with length so decoder knows chunk boundaries; the ciphertext is
+        # served as its own piece rather than copied onto the header
+        header = struct.pack(">I", AESEncryptor.NONCE_SIZE + len(ciphertext))
+        return [header + nonce, ciphertext]
+
+
+class _DecryptingStream(_ChunkedStream):
     """
     A streaming wrapper that decrypts AES-GCM encrypted content in chunks.
 
@@ -80,60 +128,40 @@ class _DecryptingStream(io.RawIOBase):
     """
 
     def __init__(self, source: BinaryIO, aesgcm: AESGCM):
-        self._fh = source
+        super().__init__(source)
         self._aesgcm = aesgcm
-        self._buffer = b""
-        self._eof = False
 
-    def _decrypt_chunk(self) -> bytes:
+    def _next_chunk(self) -> list[bytes]:
         # Read chunk length prefix
         length_bytes = self._fh.read(4)
         if not length_bytes:
-            self._eof = True
-            return b""
+            return []
 
         chunk_len = struct.unpack(">I", length_bytes)[0]
 
-        # Read nonce + ciphertext
-        chunk_data = self._fh.read(chunk_len)
+        # Read nonce + ciphertext, slicing them apart without copying
+        chunk_data = memoryview(self._fh.read(chunk_len))
         nonce = chunk_data[: AESEncryptor.NONCE_SIZE]
         ciphertext = chunk_data[AESEncryptor.NONCE_SIZE :]
 
-        return self._aesgcm.decrypt(nonce, ciphertext, associated_data=None)
+        return [self._aesgcm.decrypt(nonce, ciphertext, associated_data=None)]
 
-    def read(self, size: int = -1) -> bytes:
-        if size == -1:
-            # Read all remaining
-            while not self._eof:
-                self._buffer += self._decrypt_chunk()
-            result = self._buffer
-            self._buffer = b""
-            return result
 
-        while len(self._buffer) < size and not self._eof:
-            self._buffer += self._decrypt_chunk()
-
-        result = self._buffer[:size]
-        self._buffer = self._buffer[size:]
-        return result
-
-    def readinto(self, b):  # type: ignore[override]
-        data = self.read(len(b))
-        b[: len(data)] = data
-        return len(data)
-
-    def close(self):
-        self._fh.close()
-        super().close()
-
-    def readable(self) -> bool:
-        return True
-
-    def writable(self) -> bool:
-        return False
+@functools.lru_cache(maxsize=32)
+def _derive_key(key: str, length: int, iterations: int) -> bytes:
+    """
+    Derives a key of the given length from a passphrase with PBKDF2.
 
-    def seekable(self) -> bool:
-        return False
+    Cached, as every backend with the same passphrase would otherwise pay the full
+    iteration count again when its encryptor is created.
+    """
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=length,
+        salt=b"NaCl",
+        iterations=iterations,
+    )
+    return kdf.derive(key.encode("utf8"))
 
 
 class AESEncryptor(BaseEncryptor):
@@ -150,37 +178,53 @@ class AESEncryptor(BaseEncryptor):
     # AES-GCM tag size
     TAG_SIZE = 16
 
+    # How many identifier encryptions to remember (AES-SIV is deterministic)
+    max_identifier_cache = 16384
+
     def __init__(self, key: str, key_iterations: int = 100000):
         # Derive a 64-byte key for AES-SIV (requires 256 or 512 bit key)
-        kdf_siv = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=64,
-            salt=b"NaCl",
-            iterations=key_iterations,
-        )
-        siv_key = kdf_siv.derive(key.encode("utf8"))
+        siv_key = _derive_key(key, 64, key_iterations)
         self._aessiv = AESSIV(siv_key)
 
         # Derive a 32-byte key for AES-GCM (256-bit)
-        kdf_gcm = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=b"NaCl",
-            iterations=key_iterations,
-        )
-        gcm_key = kdf_gcm.derive(key.encode("utf8"))
+        gcm_key = _derive_key(key, 32, key_iterations)
+        # One AESGCM per encryptor: it keeps its initialised OpenSSL cipher
+        # context (and so the expanded AES-NI key schedule) between calls, and
+        # only the nonce is reset per chunk. Building a Cipher per chunk instead
+        # redoes the key setup and is markedly slower on small chunks.
         self._aesgcm = AESGCM(gcm_key)
+        # Shared by every operator thread using this backend. Lookups are single
+        # dict operations, but eviction is not, so writes take the lock
+        self._identifier_cache: dict[str, str] = {}
+        self._identifier_lock = threading.Lock()
+
+    def _remember_identifier(self, identifier: str, crypttext: str):
+        """
+        Stores an identifier's encryption, evicting the oldest entry when full.
+        """
+        with self._identifier_lock:
+            if len(self._identifier_cache) >= self.max_identifier_cache:
+                self._identifier_cache.pop(next(iter(self._identifier_cache)), None)
+            self._identifier_cache[identifier] = crypttext
 
     def encrypt_identifier(self, identifier: str) -> str:
-        ciphertext = self._aessiv.encrypt(
-            identifier.encode("utf8"), associated_data=None
-        )
-        return base64.urlsafe_b64encode(ciphertext).decode("ascii")
+        crypttext = self._identifier_cache.get(identifier)
+        if crypttext is None:
+            ciphertext = self._aessiv.encrypt(
+                identifier.encode("utf8"), associated_data=None
+            )
+            crypttext = base64.urlsafe_b64encode(ciphertext).decode("ascii")
+            self._remember_identifier(identifier, crypttext)
+        return crypttext
 
     def decrypt_identifier(self, crypttext: str) -> str:
         ciphertext = base64.urlsafe_b64decode(crypttext)
         plaintext = self._aessiv.decrypt(ciphertext, associated_data=None)
-        return plaintext.decode("utf8")
+        identifier = plaintext.decode("utf8")
+        # Content walks decrypt every stored name, which are the ones we will
+        # next be asked to encrypt
+        self._remember_identifier(identifier, crypttext)
+        return identifier
 
     def encrypt_file(self, content: BinaryIO) -> BinaryIO:
         return _EncryptingStream(content, self._aesgcm, self.chunk_size)  # type: ignore[return-value]
@@ -0,0 +1,113 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+from pathlib import Path
+
+# Event masks from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# Everything that could mean a file under a watched directory changed
+CHANGE_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class Inotify:
+    """
+    Minimal ctypes wrapper around the Linux inotify API, watching directories for
+    changes to the files inside them.
+
+    Raises OSError on construction if inotify is not available on this platform.
+    """
+
+    def __init__(self, mask: int = CHANGE_MASK):
+        self.mask = mask
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("Cannot find libc")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not available on this platform")
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.watches: dict[int, Path] = {}
+        # Set if the kernel queue overflowed and events were lost
+        self.overflowed = False
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def add_watch(self, directory: Path):
+        """
+        Watches the given directory (not recursively).
+
+        Directories that have vanished in the meantime are silently skipped.
+        """
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(directory), self.mask | IN_ONLYDIR
+        )
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise OSError(error, os.strerror(error), str(directory))
+        self.watches[wd] = directory
+
+    def read(self) -> list[tuple[Path, int]]:
+        """
+        Returns all pending events as (path, mask) pairs without blocking.
+        """
+        events: list[tuple[Path, int]] = []
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, name_length = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                name = buffer[offset : offset + name_length].rstrip(b"\0")
+                offset += name_length
+                if mask & IN_Q_OVERFLOW:
+                    self.overflowed = True
+                    continue
+                directory = self.watches.get(wd)
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                if directory is None:
+                    continue
+                events.append(
+                    (directory / os.fsdecode(name) if name else directory, mask)
+                )
+        return events
+
+    def close(self):
+        os.close(self._fd)
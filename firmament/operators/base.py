@@ -1,6 +1,5 @@
 import logging
 import threading
-import time
 
 from firmament.config import Config
 
@@ -13,27 +12,68 @@ class BaseOperator(threading.Thread):
     interval_short: float = 1
     interval_long: float = 10
     log_name = "base-operator"
+    # If True, runs in its own thread rather than on the server's shared scheduler
+    # (for operators that block for long periods, e.g. on network I/O)
+    threaded: bool = False
 
     def __init__(self, config: Config):
         self.config = config
         self.running: bool = False
+        # Set by stop() to cut short any wait between steps
+        self.stopping = threading.Event()
+        self.interval: float = self.interval_short
         self.logger = logging.getLogger(self.log_name)
         super().__init__(daemon=True)
 
     def run(self):
         self.running = True
-        interval = self.interval_short
-        while self.running:
-            try:
-                active = self.step()
-                if active:
-                    interval = self.interval_short
-                else:
-                    interval = min(interval * 2, self.interval_long)
-                time.sleep(interval)
-            except BaseException as e:
-                self.logger.exception(f"{self.log_name}: {e}")
-                time.sleep(30)
+        # stopping is checked too, in case stop() came before we started
+        while self.running and not self.stopping.is_set():
+            self.wait(self.run_step())
+
+    def stop(self):
+        """
+        Asks a threaded operator to exit once its current step is done, waking it if it
+        is waiting.
+
+        It should be join()ed before calling close().
+        """
+        self.running = False
+        self.stopping.set()
+
+    def run_step(self) -> float:
+        """
+        Runs a single step, backing off if it did no work.
+
+        Returns how many seconds to wait before the next step.
+        """
+        try:
+            active = self.step()
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except BaseException as e:
+            self.logger.exception(f"{self.log_name}: {e}")
+            return 30
+        if active:
+            self.interval = self.interval_short
+        else:
+            self.interval = min(self.interval * 2, self.interval_long)
+        return self.interval
+
+    def wait(self, timeout: float):
+        """
+        Called between steps to wait for up to timeout seconds.
+
+        Operators with an event source can override this to wake early when there is
+        work to do; they must also return promptly once stopping is set.
+        """
+        self.stopping.wait(timeout)
+
+    def close(self):
+        """
+        Called when the operator shuts down, to release anything (like open files) it
+        keeps between steps.
+        """
 
     def step(self) -> bool:
         """
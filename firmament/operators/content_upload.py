@@ -8,6 +8,7 @@ class ContentUploadOperator(BaseOperator):
     """
 
     log_name = "content-upload"
+    threaded = True
 
     def step(self) -> bool:
         uploaded = 0
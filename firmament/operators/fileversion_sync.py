@@ -7,6 +7,7 @@ class FileVersionSyncOperator(BaseOperator):
     """
 
     log_name = "fileversion-sync"
+    threaded = True
     interval_short = 5
 
     def step(self) -> bool:
@@ -1,6 +1,10 @@
 import os
+from collections import OrderedDict
+from pathlib import Path
 
+from firmament.config import Config
 from firmament.constants import DELETED_CONTENT_HASH
+from firmament.osutil import rename_noreplace
 
 from .base import BaseOperator
 
@@ -11,27 +15,99 @@ class LocalCreateOperator(BaseOperator):
     """
 
     log_name = "local-create"
+    threaded = True
     interval_short = 0.5
     max_per_loop = 20
+    max_dirfds = 1024
+
+    def __init__(self, config: Config):
+        super().__init__(config)
+        # Open directory fds (LRU order) so per-file operations avoid pathwalks
+        self._dirfd_cache: OrderedDict[Path, int] = OrderedDict()
+        # Paths we can't create because something untracked is in the way
+        self.conflicts: set[str] = set()
+
+    def _dirfd(self, directory: Path) -> int:
+        """
+        Returns a cached O_DIRECTORY fd for the directory, creating it if needed.
+
+        A cached fd is only reused while it is still the directory at that path, so
+        renaming or replacing the directory doesn't send files to the old one.
+        """
+        dirfd = self._dirfd_cache.get(directory)
+        if dirfd is not None:
+            try:
+                current = os.stat(directory)
+            except FileNotFoundError:
+                current = None
+            cached = os.fstat(dirfd)
+            if (
+                current is not None
+                and current.st_dev == cached.st_dev
+                and current.st_ino == cached.st_ino
+            ):
+                self._dirfd_cache.move_to_end(directory)
+                return dirfd
+            os.close(self._dirfd_cache.pop(directory))
+        directory.mkdir(parents=True, exist_ok=True)
+        dirfd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        self._dirfd_cache[directory] = dirfd
+        # Evict least-recently-used fds to stay well under RLIMIT_NOFILE
+        while len(self._dirfd_cache) > self.max_dirfds:
+            _, old_fd = self._dirfd_cache.popitem(last=False)
+            os.close(old_fd)
+        return dirfd
+
+    def close(self):
+        while self._dirfd_cache:
+            os.close(self._dirfd_cache.popitem()[1])
+
+    def _open_temporary(self, directory: Path, name: str) -> tuple[int, int]:
+        """
+        Opens a temporary file for writing relative to the directory's fd, returning
+        (dirfd, fd).
+
+        Re-opens the directory if it was removed since we cached it.
+        """
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        dirfd = self._dirfd(directory)
+        try:
+            return dirfd, os.open(name, flags, 0o666, dir_fd=dirfd)
+        except FileNotFoundError:
+            os.close(self._dirfd_cache.pop(directory))
+            dirfd = self._dirfd(directory)
+            return dirfd, os.open(name, flags, 0o666, dir_fd=dirfd)
+
+    def conflict(self, path: str):
+        """
+        Records that something untracked is where path should be created, warning only
+        the first time so we don't log it every step.
+        """
+        if path not in self.conflicts:
+            self.conflicts.add(path)
+            self.logger.warning(
+                f"Not replacing existing untracked {self.config.disk_path(path)}"
+            )
 
     def step(self) -> bool:
         created = 0
         deleted = 0
 
         # Handle deletions: find FileVersions marked deleted that still have a LocalVersion
-        for path in self.config.file_versions.deleted_paths():
-            if path in self.config.local_versions:
-                file_path = self.config.disk_path(path)
-                if file_path.exists():
-                    file_path.unlink()
-                    self.logger.debug(f"Deleted {file_path}")
-                del self.config.local_versions[path]
-                deleted += 1
+        to_delete = set(self.config.file_versions.deleted_paths())
+        to_delete.intersection_update(self.config.local_versions.keyset())
+        for path in to_delete:
+            file_path = self.config.disk_path(path)
+            if file_path.exists():
+                file_path.unlink()
+                self.logger.debug(f"Deleted {file_path}")
+            del self.config.local_versions[path]
+            deleted += 1
 
         # Calculate which FileVersion paths do not have a LocalVersion
-        potential_paths = set(self.config.file_versions.keys())
-        potential_paths.difference_update(self.config.local_versions.keys())
-        for path in potential_paths:
+        for path in self.config.file_versions.paths_missing_locally(
+            self.config.local_versions
+        ):
             if created > self.max_per_loop:
                 break
             # Should we even sync this path?
@@ -47,29 +123,55 @@ class LocalCreateOperator(BaseOperator):
             # Skip deleted files (handled above)
             if most_recent_content == DELETED_CONTENT_HASH:
                 continue
-            # Download the content to a temporary file
+            # Don't download anything if there's already something there; if it's
+            # a file the scanner will pick it up, and if not it needs a human
             final_destination = self.config.disk_path(path)
-            final_destination.parent.mkdir(parents=True, exist_ok=True)
-            temporary_destination = final_destination.with_name(
-                f".firmament-temp.{final_destination.name}"
-            )
+            if os.path.lexists(final_destination):
+                self.conflict(path)
+                continue
+            # Download the content to a temporary file
+            temporary_name = f".firmament-temp.{final_destination.name}"
             # TODO: Go through backends in download priority order
             for backend in self.config.backends.values():
                 if backend.content_exists(most_recent_content):
                     self.logger.debug(
-                        f"Downloading {most_recent_content} to {temporary_destination}"
+                        f"Downloading {most_recent_content} to {temporary_name}"
                     )
-                    backend.content_download(most_recent_content, temporary_destination)
-                    os.utime(
-                        temporary_destination,
-                        (most_recent_meta["mtime"], most_recent_meta["mtime"]),
+                    dirfd, fd = self._open_temporary(
+                        final_destination.parent, temporary_name
                     )
+                    with open(fd, "wb") as local_fh:
+                        backend.content_download_io(most_recent_content, local_fh)
+                        local_fh.flush()
+                        os.utime(
+                            fd,
+                            (most_recent_meta["mtime"], most_recent_meta["mtime"]),
+                        )
+                        # We know what we wrote, so the hasher need not re-read it
+                        # (nor re-hash it under a different algorithm)
+                        self.config.hash_cache.set_hash(
+                            os.fstat(fd), most_recent_content, downloaded=True
+                        )
                     break
             else:
                 self.logger.warn(
                     f"Cannot download content {most_recent_content} for {path} - not available on any backend"
                 )
                 continue
+            # Move the temporary file into place, unless something appeared there
+            # in the meantime - in which case the scanner will pick that up instead
+            try:
+                rename_noreplace(
+                    temporary_name,
+                    final_destination.name,
+                    src_dir_fd=dirfd,
+                    dst_dir_fd=dirfd,
+                )
+            except FileExistsError:
+                os.unlink(temporary_name, dir_fd=dirfd)
+                self.conflict(path)
+                continue
+            self.conflicts.discard(path)
             # Create a LocalVersion with an empty content hash (so it's rechecked)
             self.config.local_versions[path] = {
                 "content_hash": None,
@@ -77,8 +179,7 @@ class LocalCreateOperator(BaseOperator):
                 "size": most_recent_meta["size"],
                 "last_hashed": None,
             }
-            # Move the temporary file into place
-            temporary_destination.rename(final_destination)
             self.logger.debug(f"Downloaded {final_destination}")
             created += 1
+        self.config.hash_cache.flush()
         return created > 0 or deleted > 0
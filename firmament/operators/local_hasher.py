@@ -1,7 +1,11 @@
-import hashlib
 import os
 import time
 
+from firmament.config import Config
+from firmament.osutil import drop_page_cache
+from firmament.types import LocalVersionData
+from firmament.utils import hash_file
+
 from .base import BaseOperator
 
 
@@ -11,19 +15,61 @@ class LocalHasherOperator(BaseOperator):
     """
 
     log_name = "local-hasher"
+    threaded = True
+    read_buffer_size = 1024 * 1024
+    # How many hashed files to write per database transaction (entries changed by
+    # the scanner or LocalCreate since they were hashed are not overwritten)
+    batch_size = 100
+
+    def __init__(self, config: Config):
+        super().__init__(config)
+        # Reused for every file, rather than allocating a buffer per hash
+        self.read_buffer = bytearray(self.read_buffer_size)
 
     def step(self) -> bool:
         hashed = 0
-        for path in self.config.local_versions.without_content_hashes():
-            with open(self.config.disk_path(path), "rb") as fh:
-                content_hash = hashlib.sha256(fh.read()).hexdigest()
-                stat_result = os.stat(fh.fileno())
-            self.config.local_versions[path] = {
-                "content_hash": content_hash,
-                "size": stat_result.st_size,
-                "mtime": int(stat_result.st_mtime),
-                "last_hashed": int(time.time()),
-            }
-            hashed += 1
-            self.logger.debug(f"Hashed file {path} as {content_hash}")
+        pending: dict[str, LocalVersionData] = {}
+        try:
+            for path in self.config.local_versions.without_content_hashes():
+                try:
+                    content_hash, stat_result = self.hash_path(path)
+                except (FileNotFoundError, PermissionError) as e:
+                    # The scanner will notice if it's gone; otherwise retry later
+                    self.logger.debug(f"Cannot hash file {path}: {e}")
+                    continue
+                pending[path] = {
+                    "content_hash": content_hash,
+                    "size": stat_result.st_size,
+                    "mtime": int(stat_result.st_mtime),
+                    "last_hashed": int(time.time()),
+                }
+                if len(pending) >= self.batch_size:
+                    self.config.local_versions.set_hashed(pending)
+                    pending = {}
+                hashed += 1
+                self.logger.debug(f"Hashed file {path} as {content_hash}")
+        finally:
+            # Keep what we've hashed even if a later file fails
+            self.config.local_versions.set_hashed(pending)
+            self.config.hash_cache.flush()
         return bool(hashed)
+
+    def hash_path(self, path: str) -> tuple[str, os.stat_result]:
+        """
+        Returns the content hash and stat result for a file, using the hash cache if it
+        is unchanged since it was last hashed.
+        """
+        with open(self.config.disk_path(path), "rb") as fh:
+            # Skip reading the file if we've already hashed it as it is now
+            stat_result = os.stat(fh.fileno())
+            content_hash = self.config.hash_cache.get_hash(
+                stat_result, self.config.hash_algorithm
+            )
+            if content_hash is None:
+                content_hash = hash_file(
+                    fh, self.config.hash_algorithm, self.read_buffer
+                )
+                stat_result = os.stat(fh.fileno())
+                self.config.hash_cache.set_hash(stat_result, content_hash)
+                drop_page_cache(fh.fileno())
+        return content_hash, stat_result
@@ -1,7 +1,15 @@
+import errno
+import os
+import select
 import time
+from pathlib import Path
+from typing import cast
 
+from firmament.config import Config
 from firmament.constants import DELETED_CONTENT_HASH
-from firmament.types import LocalVersionData
+from firmament.datastore import HashCache
+from firmament.inotify import Inotify
+from firmament.types import FileVersionData, LocalVersionData
 
 from .base import BaseOperator
 
@@ -10,62 +18,252 @@ class LocalScannerOperator(BaseOperator):
     """
     Scans for local files in our root and updates our LocalFile table
     with any discoveries - and handles any missing files as potential deletions.
+
+    Where inotify is available, only paths it reports as changed are rescanned,
+    with a full walk done periodically (or after lost events) as verification.
     """
 
     log_name = "local-scanner"
+    threaded = True
+    full_scan_interval = 300
+    # How many LocalVersion changes to write per database transaction
+    batch_size = 1000
+    # How often to check for stop() while waiting on inotify
+    stop_check_interval = 0.5
+
+    def __init__(self, config: Config):
+        super().__init__(config)
+        self.last_full_scan: float | None = None
+        self.pending: dict[str, LocalVersionData] = {}
+        self.inotify: Inotify | None
+        try:
+            self.inotify = Inotify()
+        except OSError as e:
+            self.logger.info(f"inotify unavailable, polling instead: {e}")
+            self.inotify = None
+
+    def wait(self, timeout: float):
+        if self.inotify is None:
+            super().wait(timeout)
+            return
+        # Wait in slices so a stop() is noticed reasonably quickly
+        deadline = time.monotonic() + timeout
+        while not self.stopping.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            readable, _, _ = select.select(
+                [self.inotify], [], [], min(remaining, self.stop_check_interval)
+            )
+            if readable:
+                return
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
 
     def step(self) -> bool:
-        scanned = 0
+        if (
+            self.inotify is None
+            or self.inotify.overflowed
+            or self.last_full_scan is None
+            or time.monotonic() - self.last_full_scan > self.full_scan_interval
+        ):
+            return self.full_scan()
+        return self.incremental_scan()
+
+    def full_scan(self) -> bool:
+        """
+        Walks the entire root, finding new, changed and deleted files.
+        """
+        if self.inotify is not None:
+            # The walk will see the effects of anything pending
+            self.inotify.read()
+            self.inotify.overflowed = False
+        self.last_full_scan = time.monotonic()
+        live_keys: set[str] = set()
+        scanned, new, seen = self.scan_directory(self.config.root_path, live_keys)
+        self.flush_pending()
+        self.logger.debug(f"{scanned} files scanned")
+        deleted = self.handle_deleted(set(self.config.local_versions.keys()) - seen)
+        # Forget hashes of files that are gone (or replaced by another inode)
+        self.config.hash_cache.prune(live_keys)
+        if new:
+            self.logger.info(f"{new} new files discovered")
+        if deleted:
+            self.logger.info(f"{deleted} files found deleted")
+        return new > 0 or deleted > 0
+
+    def incremental_scan(self) -> bool:
+        """
+        Rescans only the paths inotify has told us about.
+        """
+        assert self.inotify is not None
+        changed = {path for path, _ in self.inotify.read()}
         new = 0
-        deleted = 0
-        seen: set[str] = set()
-        for directory, subdirs, filenames in self.config.root_path.walk():
-            if ".firmament" in subdirs:
-                subdirs.remove(".firmament")
-            for filename in filenames:
-                if filename.startswith(".firmament"):
-                    continue
-                scanned += 1
-                # Calculate what this file is and its mtime
-                file_path = (directory / filename).resolve()
-                firmament_path = "/" + str(file_path.relative_to(self.config.root_path))
+        vanished: set[str] = set()
+        for disk_path in changed:
+            if disk_path.name.startswith(".firmament"):
+                continue
+            try:
+                firmament_path = self.firmament_path(disk_path)
+            except ValueError:
+                continue
+            if disk_path.is_dir(follow_symlinks=False):
+                new += self.scan_directory(disk_path)[1]
+            elif disk_path.is_file():
                 try:
-                    stat_result = file_path.stat()
+                    new += self.scan_file(firmament_path, disk_path.stat())
                 except FileNotFoundError:
-                    # File was deleted between walk() and stat()
-                    continue
-                seen.add(firmament_path)
-                # See if we have a database entry for that, or if it's older
-                local_version_data = self.config.local_versions.get(firmament_path)
-                new_version_data: LocalVersionData = {
-                    "content_hash": None,
-                    "mtime": int(stat_result.st_mtime),
-                    "size": stat_result.st_size,
-                    "last_hashed": None,
-                }
-                if local_version_data is None or (
-                    local_version_data["mtime"] < new_version_data["mtime"]
-                ):
-                    self.config.local_versions[firmament_path] = new_version_data
-                    self.logger.debug(f"New file found: {firmament_path}")
-                    new += 1
-        self.logger.debug(f"{scanned} files scanned")
-        deleted_paths = set(self.config.local_versions.keys()) - seen
-        for path in deleted_paths:
-            deleted += 1
-            if self.config.path_requests.resolve_status(path) == "full":
-                self.logger.debug(f"File deleted (propagating): {path}")
-                self.config.file_versions.set_with_content(
-                    path,
-                    DELETED_CONTENT_HASH,
-                    {"mtime": int(time.time()), "size": 0},
-                )
-                del self.config.local_versions[path]
+                    vanished.add(firmament_path)
             else:
-                self.logger.debug(f"File deleted (not propagating): {path}")
-                del self.config.local_versions[path]
+                # Could be a file or a whole directory that went away
+                vanished.add(firmament_path)
+        self.flush_pending()
+        deleted = 0
+        if vanished:
+            candidates = {
+                path
+                for path in self.config.local_versions.keys()
+                if path in vanished
+                or any(path.startswith(prefix + "/") for prefix in vanished)
+            }
+            deleted = self.handle_deleted(
+                {p for p in candidates if not self.config.disk_path(p).exists()}
+            )
         if new:
             self.logger.info(f"{new} new files discovered")
         if deleted:
             self.logger.info(f"{deleted} files found deleted")
         return new > 0 or deleted > 0
+
+    def firmament_path(self, disk_path: Path) -> str:
+        """
+        Converts an on-disk path into a virtual path (starting with /).
+        """
+        return "/" + str(disk_path.relative_to(self.config.root_path))
+
+    def scan_directory(
+        self, root: Path, live_keys: set[str] | None = None
+    ) -> tuple[int, int, set[str]]:
+        """
+        Walks a directory tree, scanning every file in it and adding inotify watches as
+        we go.
+
+        Uses os.scandir directly so we never build Path objects or resolve() per file;
+        virtual paths are sliced straight off the entry's path.
+
+        If live_keys is passed, the HashCache key of every file is added to it.
+
+        Returns (files scanned, new files, virtual paths seen).
+        """
+        scanned = 0
+        new = 0
+        seen: set[str] = set()
+        root_prefix_length = len(str(self.config.root_path).rstrip("/"))
+        stack = [str(root)]
+        while stack:
+            directory = stack.pop()
+            if self.inotify is not None:
+                self.watch(Path(directory))
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name != ".firmament":
+                                stack.append(entry.path)
+                            continue
+                        if entry.name.startswith(".firmament"):
+                            continue
+                        try:
+                            if not entry.is_file():
+                                continue
+                            stat_result = entry.stat()
+                        except FileNotFoundError:
+                            # File was deleted between scandir() and stat()
+                            continue
+                        scanned += 1
+                        firmament_path = entry.path[root_prefix_length:]
+                        seen.add(firmament_path)
+                        if live_keys is not None:
+                            live_keys.add(HashCache.stat_key(stat_result))
+                        new += self.scan_file(firmament_path, stat_result)
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                continue
+        return scanned, new, seen
+
+    def watch(self, directory: Path):
+        """
+        Adds an inotify watch on the directory.
+
+        If we run out of watches (or kernel memory for them), gives up on inotify and
+        goes back to polling with full scans, as a partially-watched tree would miss
+        changes.
+        """
+        assert self.inotify is not None
+        try:
+            self.inotify.add_watch(directory)
+        except OSError as e:
+            if e.errno not in (errno.ENOSPC, errno.ENOMEM):
+                raise
+            self.logger.warning(
+                f"Cannot add inotify watch ({e.strerror}), polling instead; "
+                "raise fs.inotify.max_user_watches to avoid this"
+            )
+            self.inotify.close()
+            self.inotify = None
+
+    def scan_file(self, firmament_path: str, stat_result: os.stat_result) -> int:
+        """
+        Updates the LocalVersion for a single file if it is new or changed.
+
+        Returns 1 if it was, 0 otherwise.
+        """
+        # See if we have a database entry for that, or if it's older
+        local_version_data = self.config.local_versions.get(firmament_path)
+        new_version_data: LocalVersionData = {
+            "content_hash": None,
+            "mtime": int(stat_result.st_mtime),
+            "size": stat_result.st_size,
+            "last_hashed": None,
+        }
+        if local_version_data is None or (
+            local_version_data["mtime"] < new_version_data["mtime"]
+        ):
+            self.pending[firmament_path] = new_version_data
+            if len(self.pending) >= self.batch_size:
+                self.flush_pending()
+            self.logger.debug(f"New file found: {firmament_path}")
+            return 1
+        return 0
+
+    def flush_pending(self):
+        """
+        Writes out any queued LocalVersion changes in one transaction.
+        """
+        self.config.local_versions.set_many(self.pending)
+        self.pending = {}
+
+    def handle_deleted(self, deleted_paths: set[str]) -> int:
+        """
+        Removes LocalVersions for files that have gone from disk, propagating the
+        deletion to FileVersions where the path is fully synced.
+        """
+        deleted_file_versions = {}
+        for path in deleted_paths:
+            if self.config.path_requests.resolve_status(path) == "full":
+                self.logger.debug(f"File deleted (propagating): {path}")
+                file_version_data = cast(
+                    FileVersionData, self.config.file_versions.get(path, default={})
+                )
+                file_version_data[DELETED_CONTENT_HASH] = {
+                    "mtime": int(time.time()),
+                    "size": 0,
+                }
+                deleted_file_versions[path] = file_version_data
+            else:
+                self.logger.debug(f"File deleted (not propagating): {path}")
+        self.config.file_versions.set_many(deleted_file_versions)
+        self.config.local_versions.delete_many(deleted_paths)
+        return len(deleted_paths)
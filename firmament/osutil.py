@@ -0,0 +1,87 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+
+AT_FDCWD = -100
+RENAME_NOREPLACE = 1
+
+
+def _load_renameat2():
+    libc_name = ctypes.util.find_library("c")
+    if libc_name is None:
+        return None
+    renameat2 = getattr(ctypes.CDLL(libc_name, use_errno=True), "renameat2", None)
+    if renameat2 is not None:
+        renameat2.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint,
+        ]
+        renameat2.restype = ctypes.c_int
+    return renameat2
+
+
+_renameat2 = _load_renameat2()
+
+
+def rename_noreplace(
+    src: str,
+    dst: str,
+    src_dir_fd: int | None = None,
+    dst_dir_fd: int | None = None,
+):
+    """
+    Atomically renames src to dst, raising FileExistsError rather than replacing dst if
+    it already exists.
+
+    Uses renameat2(RENAME_NOREPLACE) where the platform and filesystem support it, and
+    falls back to link() + unlink(), which also refuses to replace. On filesystems
+    without hard links either, checks for dst and then renames, which is not atomic.
+    """
+    if _renameat2 is not None:
+        result = _renameat2(
+            AT_FDCWD if src_dir_fd is None else src_dir_fd,
+            os.fsencode(src),
+            AT_FDCWD if dst_dir_fd is None else dst_dir_fd,
+            os.fsencode(dst),
+            RENAME_NOREPLACE,
+        )
+        if result == 0:
+            return
+        error = ctypes.get_errno()
+        # EINVAL/ENOSYS mean the filesystem or kernel can't do it; anything else
+        # (including EEXIST) is a real answer
+        if error not in (errno.EINVAL, errno.ENOSYS):
+            raise OSError(error, os.strerror(error), src, None, dst)
+    try:
+        os.link(src, dst, src_dir_fd=src_dir_fd, dst_dir_fd=dst_dir_fd)
+    except OSError as e:
+        # No hard links here (e.g. FAT, many FUSE mounts)
+        if e.errno not in (errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP):
+            raise
+    else:
+        os.unlink(src, dir_fd=src_dir_fd)
+        return
+    try:
+        os.stat(dst, dir_fd=dst_dir_fd, follow_symlinks=False)
+    except FileNotFoundError:
+        os.rename(src, dst, src_dir_fd=src_dir_fd, dst_dir_fd=dst_dir_fd)
+    else:
+        raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), src, None, dst)
+
+
+def drop_page_cache(fd: int):
+    """
+    Advises the kernel that we won't re-read this file soon, so its pages can be dropped
+    from the page cache rather than evicting more useful data.
+
+    Only clean pages are dropped, so this is for files we've just read; pages of a file
+    we've just written stay until they have been written back.
+
+    Does nothing on platforms without posix_fadvise.
+    """
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
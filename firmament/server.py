@@ -1,3 +1,4 @@
+import heapq
 import logging
 import time
 
@@ -18,7 +19,8 @@ class Server:
     """
     Main server.
 
-    Runs a series of operator loops.
+    Runs a series of operator loops - threaded operators each get their own
+    thread, and the rest share a single cooperative scheduler.
     """
 
     operators: list[type[BaseOperator]] = [
@@ -31,6 +33,9 @@ class Server:
         DownloadOnceCleanupOperator,
     ]
 
+    # How long to wait for threaded operators to finish their steps on exit
+    shutdown_timeout = 10
+
     def __init__(self, config: Config):
         self.config = config
 
@@ -40,16 +45,59 @@ class Server:
         """
         logging.debug("Main loop starting")
 
-        # Create a thread per operator and start it
-        threads = []
-        for operator in self.operators:
-            threads.append(operator(self.config))
-        [thread.start() for thread in threads]
+        # Operators that opt in get their own thread; the rest share this one
+        threaded: list[BaseOperator] = []
+        scheduled: list[BaseOperator] = []
+        for operator_class in self.operators:
+            operator = operator_class(self.config)
+            if operator.threaded:
+                operator.start()
+                threaded.append(operator)
+            else:
+                scheduled.append(operator)
 
-        # Wait for a shutdown signal
+        # Run the shared operators until we get a shutdown signal
         logging.info("Running. Ctrl-C to exit.")
         try:
-            while True:
-                time.sleep(0.1)
+            self.run_scheduled(scheduled)
         except KeyboardInterrupt:
             pass
+        finally:
+            self.shutdown(threaded, scheduled)
+
+    def shutdown(self, threaded: list[BaseOperator], scheduled: list[BaseOperator]):
+        """
+        Stops the threaded operators, giving them shutdown_timeout seconds in total to
+        finish their current steps, and then closes every operator that has stopped.
+        """
+        for operator in threaded:
+            operator.stop()
+        deadline = time.monotonic() + self.shutdown_timeout
+        for operator in threaded:
+            operator.join(max(deadline - time.monotonic(), 0))
+            if operator.is_alive():
+                # Still mid-step, so it may be using what close() would release
+                logger.warning(f"{operator.log_name} did not stop in time")
+                continue
+            operator.close()
+        for operator in scheduled:
+            operator.close()
+
+    def run_scheduled(self, operators: list[BaseOperator]):
+        """
+        Runs the given operators cooperatively on the current thread, using a heap of
+        (next run time, index) so we only ever wake for the next one due.
+        """
+        queue = [(time.monotonic(), index) for index in range(len(operators))]
+        heapq.heapify(queue)
+        while True:
+            if not queue:
+                time.sleep(1)
+                continue
+            next_run, index = queue[0]
+            delay = next_run - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+                continue
+            delay = operators[index].run_step()
+            heapq.heapreplace(queue, (time.monotonic() + delay, index))
@@ -1,4 +1,7 @@
-from datetime import datetime
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Set as AbstractSet
 
 from rich.text import Text
 from textual.app import App, ComposeResult
@@ -11,7 +14,15 @@ from firmament.config import Config
 from firmament.constants import DELETED_CONTENT_HASH
 from firmament.types import PathRequestType
 
-from .tree import FileStatus, FileTree, TreeNodeData, build_tree
+from .tree import (
+    FileStatus,
+    FileTree,
+    TreeNodeData,
+    TreeSnapshot,
+    build_tree,
+)
+
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
 
 
 class FirmamentTUI(App[None]):
@@ -70,9 +81,30 @@ class FirmamentTUI(App[None]):
         Binding("ctrl+d", "delete_local", "Delete Local"),
     ]
 
+    # How many rendered details panes to keep
+    max_details_cache = 256
+
     def __init__(self, config: Config):
         super().__init__()
         self.config = config
+        # The data the tree widget currently shows, and its nodes by path, so
+        # refreshes can apply only what changed
+        self._last_snapshot: TreeSnapshot | None = None
+        self._node_index: dict[str, TreeNode[TreeNodeData]] = {}
+        # Directories whose children have been added to the tree widget; the
+        # rest are populated when first expanded
+        self._loaded_paths: set[str] = set()
+        # Config.version_counter as of the last refresh, so idle ticks can skip
+        self._last_version: int | None = None
+        # Set when an action has changed data and a refresh is already queued
+        self._dirty = False
+        # Rendered details pane contents, least recently used first
+        self._details_cache: OrderedDict[tuple, Text] = OrderedDict()
+        # The legend never changes, so build it once
+        self._legend = self._legend_text()
+        # Set in on_mount
+        self.file_tree: FileTree
+        self.details_pane: Static
 
     def compose(self) -> ComposeResult:
         yield Horizontal(
@@ -83,97 +115,215 @@ class FirmamentTUI(App[None]):
             ),
             id="main-container",
         )
-        yield Static(self._legend_text(), id="legend")
+        yield Static(self._legend, id="legend")
         yield Footer()
 
     def on_mount(self) -> None:
         """
         Initialize the tree on mount.
         """
+        # These widgets live for the whole app, so only look them up once
+        self.file_tree = self.query_one("#file-tree", FileTree)
+        self.details_pane = self.query_one("#details-content", Static)
         self.refresh_tree()
         # Focus the tree for keyboard navigation
-        self.query_one("#file-tree", FileTree).focus()
+        self.file_tree.focus()
         # Set up auto-refresh every 2 seconds
         self.set_interval(2, self.refresh_tree)
 
     def refresh_tree(self) -> None:
+        """
+        Update the tree from current data, touching only nodes that changed.
+        """
+        self._dirty = False
+        version = self.config.version_counter
+        if version == self._last_version:
+            return
+        self._last_version = version
+        if self._last_snapshot is None:
+            self.rebuild_tree()
+            return
+        snapshot = build_tree(self.config, self._last_snapshot)
+        self._diff_apply(self._last_snapshot, snapshot)
+        self._last_snapshot = snapshot
+
+    def rebuild_tree(self) -> None:
         """
         Rebuild tree from current data, preserving expanded state.
         """
-        tree = self.query_one("#file-tree", FileTree)
+        tree = self.file_tree
 
         # Save expanded paths before clearing
         expanded_paths = self._get_expanded_paths(tree.root)
 
         tree.clear()
 
-        tree_data = build_tree(self.config)
-        tree.root.data = tree_data
+        # Read the version first so changes made during the build aren't missed
+        self._last_version = self.config.version_counter
+        snapshot = build_tree(self.config)
+        tree.root.data = snapshot.root
         # Update root label to trigger re-render with new data
-        tree.root.set_label(tree_data.name)
-        self._populate_tree(tree.root, tree_data, expanded_paths)
+        tree.root.set_label(snapshot.root.name)
+        self._node_index = {snapshot.root.path: tree.root}
+        self._loaded_paths = set()
+        # Only directories still in the tree can be re-expanded; the expanded set is
+        # usually tiny, so filter it against the snapshot rather than the reverse
+        expanded_dir_paths = {
+            path
+            for path in expanded_paths
+            if (node_data := snapshot.nodes.get(path)) and node_data.is_directory
+        }
+        self._populate_tree(tree.root, snapshot.root, expanded_dir_paths)
         tree.root.expand()
+        self._last_snapshot = snapshot
+
+    def mark_dirty(self) -> None:
+        """
+        Queue a refresh after data changes, coalescing several changes made in quick
+        succession into a single refresh.
+        """
+        if not self._dirty:
+            self._dirty = True
+            self.call_later(self.refresh_tree)
+
+    def _diff_apply(self, old: TreeSnapshot, new: TreeSnapshot) -> None:
+        """
+        Update the tree widget (currently showing old) to show new, adding and removing
+        only the nodes that differ.
+        """
+        old_nodes = old.nodes
+        new_nodes = new.nodes
+
+        # Nodes that have gone, or switched between file and directory
+        removed = old_nodes.keys() - new_nodes.keys()
+        retyped = {
+            path
+            for path in old_nodes.keys() & new_nodes.keys()
+            if old_nodes[path].is_directory != new_nodes[path].is_directory
+        }
+        for path in sorted(removed | retyped):
+            if path in self._node_index:
+                self._remove_node(old_nodes[path])
+
+        # Point existing nodes at their new data, repainting changed labels
+        for path, new_data in new_nodes.items():
+            old_data = old_nodes.get(path)
+            if old_data is new_data:
+                # Reused by build_tree, so nothing has changed
+                continue
+            node = self._node_index.get(path)
+            if node is not None and path not in retyped:
+                node.data = new_data
+                if old_data is None or old_data.label_key != new_data.label_key:
+                    node.refresh()
+
+        # Add new nodes under directories already shown; unloaded directories
+        # pick up their children from data on expand
+        added = (new_nodes.keys() - old_nodes.keys()) | retyped
+        parents = {path.rpartition("/")[0] or "/" for path in added}
+        for parent_path in sorted(parents):
+            if parent_path not in self._loaded_paths:
+                continue
+            parent = self._node_index[parent_path]
+            siblings = new_nodes[parent_path].sorted_children
+            for index, child_data in enumerate(siblings):
+                if child_data.path in self._node_index:
+                    continue
+                if child_data.is_directory:
+                    self._node_index[child_data.path] = parent.add(
+                        child_data.name, data=child_data, before=index
+                    )
+                else:
+                    self._node_index[child_data.path] = parent.add_leaf(
+                        child_data.name, data=child_data, before=index
+                    )
+
+    def _remove_node(self, data: TreeNodeData) -> None:
+        """
+        Remove the node showing data, and forget it and its descendants.
+        """
+        self._node_index.pop(data.path).remove()
+        stack = [data]
+        while stack:
+            child = stack.pop()
+            if child.path in self._loaded_paths:
+                self._loaded_paths.discard(child.path)
+                for grandchild in child.children.values():
+                    self._node_index.pop(grandchild.path, None)
+                    stack.append(grandchild)
 
     def _get_expanded_paths(self, node: TreeNode[TreeNodeData]) -> set[str]:
         """
-        Recursively collect paths of expanded nodes.
+        Collect paths of expanded nodes under (and including) node.
+
+        Collapsed nodes' subtrees aren't visible, so they aren't walked.
         """
         expanded = set()
-        if node.is_expanded and node.data:
-            expanded.add(node.data.path)
-        for child in node.children:
-            expanded.update(self._get_expanded_paths(child))
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if not current.is_expanded:
+                continue
+            if current.data:
+                expanded.add(current.data.path)
+            stack.extend(current.children)
         return expanded
 
     def _populate_tree(
         self,
         parent: TreeNode[TreeNodeData],
         data: TreeNodeData,
-        expanded_paths: set[str] | None = None,
+        expanded_dir_paths: AbstractSet[str] = frozenset(),
     ) -> None:
         """
-        Recursively populate tree nodes.
-        """
-        if expanded_paths is None:
-            expanded_paths = set()
+        Add the children of parent's directory to the tree widget.
 
-        # Sort: directories first, then alphabetically
-        sorted_children = sorted(
-            data.children.values(),
-            key=lambda x: (not x.is_directory, x.name.lower()),
-        )
-
-        for child_data in sorted_children:
+        Only directories in expanded_dir_paths are populated further (and expanded); the
+        rest are populated when the user expands them.
+        """
+        self._loaded_paths.add(data.path)
+        for child_data in data.sorted_children:
             if child_data.is_directory:
                 node = parent.add(child_data.name, data=child_data)
-                self._populate_tree(node, child_data, expanded_paths)
+                self._node_index[child_data.path] = node
                 # Restore expanded state
-                if child_data.path in expanded_paths:
+                if child_data.path in expanded_dir_paths:
+                    self._populate_tree(node, child_data, expanded_dir_paths)
                     node.expand()
             else:
-                parent.add_leaf(child_data.name, data=child_data)
+                self._node_index[child_data.path] = parent.add_leaf(
+                    child_data.name, data=child_data
+                )
+
+    def on_tree_node_expanded(self, event: Tree.NodeExpanded) -> None:
+        """
+        Populate directories the first time they are expanded.
+        """
+        data = event.node.data
+        if data is not None and data.path not in self._loaded_paths:
+            self._populate_tree(event.node, data)
 
     def _legend_text(self) -> Text:
-        text = Text()
-        # File status indicators
-        text.append("[A]", style="bold yellow")
-        text.append("vailable ")
-        text.append("[L]", style="bold green")
-        text.append("ocal ")
-        text.append("[X]", style="bold red")
-        text.append(" Deleted | ")
-        # Path request indicators
-        text.append("<F>", style="bold cyan")
-        text.append("ull ")
-        text.append("<O>", style="bold cyan")
-        text.append("n Demand ")
-        text.append("<D>", style="bold cyan")
-        text.append("ownload Once ")
-        text.append("<I>", style="bold cyan")
-        text.append("gnore | ")
-        text.append("(x)", style="dim cyan")
-        text.append(" = inherited")
-        return text
+        return Text.assemble(
+            # File status indicators
+            ("[A]", "bold yellow"),
+            "vailable ",
+            ("[L]", "bold green"),
+            "ocal ",
+            ("[X]", "bold red"),
+            " Deleted | ",
+            # Path request indicators
+            ("<F>", "bold cyan"),
+            "ull ",
+            ("<O>", "bold cyan"),
+            "n Demand ",
+            ("<D>", "bold cyan"),
+            "ownload Once ",
+            ("<I>", "bold cyan"),
+            "gnore | ",
+            ("(x)", "dim cyan"),
+            " = inherited",
+        )
 
     def on_tree_node_highlighted(self, event: Tree.NodeHighlighted) -> None:
         """
@@ -185,12 +335,27 @@ class FirmamentTUI(App[None]):
         """
         Update the details pane with information about the selected node.
         """
-        details = self.query_one("#details-content", Static)
+        details = self.details_pane
 
         if data is None:
             details.update("Select a file to view details")
             return
 
+        # Cursor movement re-shows the same nodes a lot, so cache by data version
+        cache_key = (data.label_key, self.config.version_counter)
+        text = self._details_cache.get(cache_key)
+        if text is None:
+            text = self._details_cache[cache_key] = self._details_text(data)
+            while len(self._details_cache) > self.max_details_cache:
+                self._details_cache.popitem(last=False)
+        else:
+            self._details_cache.move_to_end(cache_key)
+        details.update(text)
+
+    def _details_text(self, data: TreeNodeData) -> Text:
+        """
+        Render the details pane contents for a node.
+        """
         text = Text()
 
         # Path
@@ -240,12 +405,14 @@ class FirmamentTUI(App[None]):
                     reverse=True,
                 )
                 for content_hash, meta in sorted_versions:
-                    mtime = datetime.fromtimestamp(meta["mtime"])
+                    mtime = time.strftime(
+                        "%Y-%m-%d %H:%M", time.localtime(meta["mtime"])
+                    )
                     # Handle deleted versions specially
                     if content_hash == DELETED_CONTENT_HASH:
                         text.append("  [X] ", style="bold red")
                         text.append("DELETED\n", style="red")
-                        text.append(f"        {mtime:%Y-%m-%d %H:%M}\n", style="dim")
+                        text.append(f"        {mtime}\n", style="dim")
                         continue
                     size = self._format_size(meta["size"])
                     # Mark if this version is local
@@ -254,7 +421,7 @@ class FirmamentTUI(App[None]):
                     else:
                         text.append("      ")
                     text.append(f"{content_hash[:12]}...\n", style="green")
-                    text.append(f"        {mtime:%Y-%m-%d %H:%M}\n", style="dim")
+                    text.append(f"        {mtime}\n", style="dim")
                     text.append(f"        {size}\n", style="dim")
                     # Show which backends have this content
                     backends = self.config.content_backends.get(content_hash, [])
@@ -263,18 +430,16 @@ class FirmamentTUI(App[None]):
                             f"        Backends: {', '.join(backends)}\n", style="dim"
                         )
 
-        details.update(text)
+        return text
 
     @staticmethod
     def _format_size(size: float) -> str:
         """
         Format size in human-readable units.
         """
-        for unit in ["B", "KB", "MB", "GB"]:
-            if size < 1024:
-                return f"{size:.1f} {unit}"
-            size /= 1024
-        return f"{size:.1f} TB"
+        # Each unit is 2**10 times the last, so the bit length picks it directly
+        index = min(4, max(0, int(size).bit_length() - 1) // 10)
+        return f"{size / (1 << (10 * index)):.1f} {_SIZE_UNITS[index]}"
 
     def action_set_full(self) -> None:
         self._set_path_request("full")
@@ -292,40 +457,40 @@ class FirmamentTUI(App[None]):
         """
         Clear direct PathRequest (inherit from parent)
         """
-        tree = self.query_one("#file-tree", FileTree)
+        tree = self.file_tree
         node = tree.cursor_node
         if node and node.data:
             path = node.data.path
             if path and path in self.config.path_requests:
                 del self.config.path_requests[path]
-                self.refresh_tree()
+                self.mark_dirty()
                 self.notify(f"Cleared PathRequest for {path}")
 
     def _set_path_request(self, request_type: PathRequestType) -> None:
         """
         Set PathRequest for selected node.
         """
-        tree = self.query_one("#file-tree", FileTree)
+        tree = self.file_tree
         node = tree.cursor_node
         if node and node.data:
             path = node.data.path
             if path:  # Don't set on root
                 self.config.path_requests[path] = request_type
-                self.refresh_tree()
+                self.mark_dirty()
                 self.notify(f"Set {path} to {request_type}")
 
     def action_refresh(self) -> None:
         """
-        Refresh tree from datastore.
+        Rebuild tree from datastore.
         """
-        self.refresh_tree()
+        self.rebuild_tree()
         self.notify("Tree refreshed")
 
-    def action_delete_local(self) -> None:
+    async def action_delete_local(self) -> None:
         """
         Delete local copy of file if path request allows it.
         """
-        tree = self.query_one("#file-tree", FileTree)
+        tree = self.file_tree
         node = tree.cursor_node
         if not node or not node.data:
             return
@@ -352,9 +517,11 @@ class FirmamentTUI(App[None]):
         path = data.path
         disk_path = self.config.disk_path(path)
         try:
-            disk_path.unlink()
+            # Deletes can stall on slow or network filesystems, so keep them off
+            # the event loop
+            await asyncio.to_thread(disk_path.unlink)
             del self.config.local_versions[path]
-            self.refresh_tree()
+            self.mark_dirty()
             self.notify(f"Deleted local copy: {path}")
         except Exception as e:
             self.notify(f"Failed to delete: {e}", severity="error")
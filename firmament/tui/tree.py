@@ -1,3 +1,4 @@
+import sys
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import TYPE_CHECKING
@@ -24,7 +25,30 @@ class FileStatus(Enum):
     DELETED = "X"  # Most recent FileVersion is DELETED_CONTENT_HASH
 
 
-@dataclass
+# Label styles, built once rather than on every render
+_STYLE_DIRECTORY = Style(color="grey70")
+_STYLE_DIRECTORY_NAME = Style(color="blue", bold=True)
+_STYLE_REQUEST_DIRECT = Style(color="cyan", bold=True)
+_STYLE_REQUEST_INHERITED = Style(color="cyan", dim=True)
+_STYLE_BACKEND_COUNT = Style(dim=True)
+
+# Status indicator and style for each file status
+_STATUS_STYLES = {
+    FileStatus.AVAILABLE: ("[A] ", Style(color="yellow")),
+    FileStatus.LOCAL: ("[L] ", Style(color="green")),
+    FileStatus.DELETED: ("[X] ", Style(color="red")),
+}
+
+# Single character representation of each PathRequestType
+_PATH_REQUEST_CHAR: dict[PathRequestType, str] = {
+    "full": "F",
+    "on-demand": "O",
+    "download-once": "D",
+    "ignore": "I",
+}
+
+
+@dataclass(slots=True)
 class TreeNodeData:
     """
     Data associated with each tree node.
@@ -38,52 +62,102 @@ class TreeNodeData:
     effective_path_request: PathRequestType  # Resolved (inherited) PathRequest
     backend_count: int = 0  # Number of backends that have this file's content
     children: dict[str, "TreeNodeData"] = field(default_factory=dict)
+    # Children in display order (directories first, then alphabetically); filled
+    # in once by build_tree
+    sorted_children: list["TreeNodeData"] = field(default_factory=list, repr=False)
+    sort_key: tuple[bool, str] = field(init=False, repr=False)
+    # The parts of this data that affect how its tree label renders
+    label_key: tuple = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.sort_key = (not self.is_directory, self.name.lower())
+        self.label_key = (
+            self.path,
+            self.name,
+            self.is_directory,
+            self.status,
+            self.path_request,
+            self.effective_path_request,
+            self.backend_count,
+        )
 
 
-def build_tree(config: "Config") -> TreeNodeData:
+@dataclass
+class TreeSnapshot:
+    """
+    A built tree, along with a flat table of every node in it by path.
+    """
+
+    root: TreeNodeData
+    nodes: dict[str, TreeNodeData]
+
+
+def build_tree(config: "Config", previous: TreeSnapshot | None = None) -> TreeSnapshot:
     """
     Build a tree structure from flat FileVersion paths.
+
+    If previous (an earlier result) is passed, file nodes that haven't changed are
+    reused from it rather than rebuilt. Directory nodes are always new, as their
+    children may differ.
     """
+    # Read each datastore once up front rather than opening a transaction per
+    # path, and bind the lookups to locals for the loop below
+    path_requests_get = config.path_requests.all_cached().get
+    default_request = config.path_requests.default
+    local_paths = config.local_versions.keyset()
+    backend_counts_get = config.content_backends.backend_counts().get
+    most_recent_index = config.file_versions.most_recent_index()
+    intern = sys.intern
+
     root = TreeNodeData(
         path="/",
         name="<root>",
         is_directory=True,
         status=None,
-        path_request=config.path_requests.get("/"),
+        path_request=path_requests_get("/"),
         effective_path_request="full",
         children={},
     )
-
-    # Get all file paths from FileVersions
-    for file_path in config.file_versions.keys():
-        # Paths start with /, so split produces ["", "dir", "file", ...]
-        parts = file_path.split("/")[1:]  # Skip empty first element
-        current = root
-        current_path = ""
-
-        # Create/traverse directory nodes
-        for part in parts[:-1]:
-            current_path = f"{current_path}/{part}"
-            if part not in current.children:
-                current.children[part] = TreeNodeData(
-                    path=current_path,
-                    name=part,
-                    is_directory=True,
-                    status=None,
-                    path_request=config.path_requests.get(current_path),
-                    effective_path_request=config.path_requests.resolve_status(
-                        current_path
-                    ),
-                    children={},
-                )
-            current = current.children[part]
+    # Every node by path; this also lets files in an already-seen directory
+    # skip walking down from the root
+    nodes = {"/": root}
+    previous_nodes = previous.nodes if previous is not None else {}
+
+    # Get all file paths (and their most recent content) from FileVersions
+    for file_path, (content_hash, _) in most_recent_index.items():
+        directory_path, _, filename = file_path.rpartition("/")
+        current = nodes.get(directory_path or "/")
+        if current is None:
+            current = root
+            current_path = ""
+            # The effective request is carried down from each parent rather than
+            # resolved per path (resolve_status never looks at the root itself)
+            parent_effective = default_request
+
+            # Create/traverse directory nodes
+            for part in directory_path[1:].split("/"):
+                # Directory names repeat a lot across paths
+                part = intern(part)
+                current_path = current_path + "/" + part
+                if part not in current.children:
+                    path_request = path_requests_get(current_path)
+                    current.children[part] = nodes[current_path] = TreeNodeData(
+                        path=current_path,
+                        name=part,
+                        is_directory=True,
+                        status=None,
+                        path_request=path_request,
+                        effective_path_request=path_request or parent_effective,
+                        children={},
+                    )
+                current = current.children[part]
+                parent_effective = current.effective_path_request
+        parent_effective = (
+            current.effective_path_request if current is not root else default_request
+        )
 
         # Create file node
-        filename = parts[-1]
-        has_local = file_path in config.local_versions
-
-        # Count backends that have the most recent version of this file
-        content_hash, _ = config.file_versions.most_recent_content(file_path)
+        has_local = file_path in local_paths
 
         # Determine file status
         if content_hash == DELETED_CONTENT_HASH:
@@ -93,23 +167,44 @@ def build_tree(config: "Config") -> TreeNodeData:
         else:
             status = FileStatus.AVAILABLE
 
+        # Count backends that have the most recent version of this file
         backend_count = 0
         if content_hash and content_hash != DELETED_CONTENT_HASH:
-            backends = config.content_backends.get(content_hash, [])
-            backend_count = len(backends) if backends else 0
-
-        current.children[filename] = TreeNodeData(
+            backend_count = backend_counts_get(content_hash, 0)
+
+        path_request = path_requests_get(file_path)
+        effective_path_request = path_request or parent_effective
+        previous_file = previous_nodes.get(file_path)
+        if (
+            previous_file is not None
+            and not previous_file.is_directory
+            and previous_file.status == status
+            and previous_file.path_request == path_request
+            and previous_file.effective_path_request == effective_path_request
+            and previous_file.backend_count == backend_count
+        ):
+            current.children[filename] = nodes[file_path] = previous_file
+            continue
+
+        current.children[filename] = nodes[file_path] = TreeNodeData(
             path=file_path,
             name=filename,
             is_directory=False,
             status=status,
-            path_request=config.path_requests.get(file_path),
-            effective_path_request=config.path_requests.resolve_status(file_path),
+            path_request=path_request,
+            effective_path_request=effective_path_request,
             backend_count=backend_count,
             children={},
         )
 
-    return root
+    # Sort each directory's children once, so refreshes don't have to
+    for node in nodes.values():
+        if node.is_directory:
+            node.sorted_children = sorted(
+                node.children.values(), key=lambda x: x.sort_key
+            )
+
+    return TreeSnapshot(root=root, nodes=nodes)
 
 
 class FileTree(Tree[TreeNodeData]):
@@ -134,10 +229,16 @@ class FileTree(Tree[TreeNodeData]):
         ("right", "expand", "Expand"),
     ]
 
+    # Rendered labels are cached by content; past this many, the cache is reset
+    max_label_cache = 10000
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.show_root = True
         self.guide_depth = 3
+        self._label_cache: dict[tuple, Text] = {}
+        # The last (label key, base style, style, label) rendered for each node id
+        self._node_labels: dict[int, tuple[tuple, Style, Style, Text]] = {}
 
     def action_collapse(self) -> None:
         """
@@ -167,17 +268,42 @@ class FileTree(Tree[TreeNodeData]):
         if data is None:
             return Text(str(node.label), style=style)
 
-        label = Text(style=style)
+        # Redraws mostly re-render a node exactly as it was last time, which we
+        # can spot without hashing the label key (Styles cache their own hashes)
+        last = self._node_labels.get(node.id)
+        if (
+            last is not None
+            and last[0] is data.label_key
+            and last[1] == base_style
+            and last[2] == style
+        ):
+            return last[3]
+
+        # Textual copies the label before modifying it, so sharing one is safe
+        cache_key = (data.label_key, base_style, style)
+        label = self._label_cache.get(cache_key)
+        if label is None:
+            if len(self._label_cache) >= self.max_label_cache:
+                self._label_cache.clear()
+            label = self._label_cache[cache_key] = self._build_label(data, style)
+        if len(self._node_labels) >= self.max_label_cache:
+            self._node_labels.clear()
+        self._node_labels[node.id] = (data.label_key, base_style, style, label)
+        return label
+
+    def _build_label(self, data: TreeNodeData, style: Style) -> Text:
+        """
+        Build the label for a single node.
+        """
+        parts: list[tuple[str, Style]] = []
 
         # Status indicator
         if data.is_directory:
-            label.append("[D] ", style=Style(color="grey70") + style)
-        elif data.status == FileStatus.DELETED:
-            label.append("[X] ", style=Style(color="red") + style)
-        elif data.status == FileStatus.LOCAL:
-            label.append("[L] ", style=Style(color="green") + style)
+            parts.append(("[D] ", _STYLE_DIRECTORY + style))
         else:
-            label.append("[A] ", style=Style(color="yellow") + style)
+            assert data.status is not None  # Only directories have no status
+            indicator, status_style = _STATUS_STYLES[data.status]
+            parts.append((indicator, status_style + style))
 
         # PathRequest indicator
         req = data.path_request  # Direct request (not inherited)
@@ -185,40 +311,28 @@ class FileTree(Tree[TreeNodeData]):
 
         if req is not None:
             # Has direct PathRequest set
-            req_char = self._path_request_char(req)
-            label.append(f"<{req_char}> ", style=Style(color="cyan", bold=True) + style)
+            parts.append(
+                (f"<{_PATH_REQUEST_CHAR[req]}> ", _STYLE_REQUEST_DIRECT + style)
+            )
         elif eff != "full" or data.path == "/":
             # Inherited non-default, or root node (always show root's effective status)
-            req_char = self._path_request_char(eff)
-            label.append(f"({req_char}) ", style=Style(color="cyan", dim=True) + style)
+            parts.append(
+                (f"({_PATH_REQUEST_CHAR[eff]}) ", _STYLE_REQUEST_INHERITED + style)
+            )
         else:
-            label.append("     ", style=style)
+            parts.append(("     ", style))
 
         # Node name
         if data.is_directory:
             # Don't append "/" to root node
             if data.path == "/":
-                label.append(data.name, style=Style(color="blue", bold=True) + style)
+                parts.append((data.name, _STYLE_DIRECTORY_NAME + style))
             else:
-                label.append(
-                    data.name + "/", style=Style(color="blue", bold=True) + style
-                )
+                parts.append((data.name + "/", _STYLE_DIRECTORY_NAME + style))
         else:
-            label.append(data.name, style=style)
+            parts.append((data.name, style))
             # Show backend count for files
             if data.backend_count > 0:
-                label.append(f" ({data.backend_count})", style=Style(dim=True) + style)
+                parts.append((f" ({data.backend_count})", _STYLE_BACKEND_COUNT + style))
 
-        return label
-
-    @staticmethod
-    def _path_request_char(pr: PathRequestType) -> str:
-        """
-        Single character representation of PathRequestType.
-        """
-        return {
-            "full": "F",
-            "on-demand": "O",
-            "download-once": "D",
-            "ignore": "I",
-        }[pr]
+        return Text.assemble(*parts, style=style)
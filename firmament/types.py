@@ -16,4 +16,12 @@ class LocalVersionData(TypedDict):
     last_hashed: int | None
 
 
+class HashCacheData(TypedDict):
+    size: int
+    mtime_ns: int
+    algorithm: str
+    downloaded: bool
+    content_hash: str
+
+
 PathRequestType = Literal["full", "on-demand", "download-once", "ignore"]
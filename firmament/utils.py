@@ -0,0 +1,65 @@
+import hashlib
+import io
+import mmap
+import os
+from typing import Literal
+
+HashAlgorithm = Literal["sha256", "blake3"]
+
+
+def check_hash_algorithm(algorithm: HashAlgorithm) -> HashAlgorithm:
+    """
+    Raises ValueError if the algorithm can't be used here (its optional package is not
+    installed).
+    """
+    if algorithm == "blake3":
+        try:
+            import blake3  # noqa: F401
+        except ImportError:
+            raise ValueError("hash_algorithm blake3 needs the blake3 package installed")
+    return algorithm
+
+
+def hash_file(
+    fh: io.BufferedIOBase,
+    algorithm: HashAlgorithm = "sha256",
+    buffer: bytearray | None = None,
+) -> str:
+    """
+    Returns the content hash of an open file, streaming rather than reading it all into
+    memory.
+
+    For SHA-256, reads go into the passed buffer if there is one, so callers hashing
+    many files can reuse a single allocation.
+
+    SHA-256 hashes are bare hex digests; other algorithms are prefixed with their name
+    so the two can never be confused.
+    """
+    if algorithm == "sha256":
+        if buffer is None:
+            return hashlib.file_digest(fh, "sha256").hexdigest()
+        digest = hashlib.sha256()
+        view = memoryview(buffer)
+        while size := fh.readinto(buffer):
+            digest.update(view[:size])
+        return digest.hexdigest()
+    elif algorithm == "blake3":
+        import blake3
+
+        hasher = blake3.blake3(max_threads=blake3.blake3.AUTO)
+        # mmap the file so the (multithreaded) hasher works directly on the page
+        # cache; zero-length files cannot be mapped, but have nothing to hash
+        if os.fstat(fh.fileno()).st_size:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                hasher.update(mapped)
+        return f"blake3:{hasher.hexdigest()}"
+    raise ValueError(f"Unknown hash algorithm {algorithm}")
+
+
+def hash_algorithm_of(content_hash: str) -> HashAlgorithm:
+    """
+    Returns the algorithm that made a content hash, going by its prefix.
+    """
+    if content_hash.startswith("blake3:"):
+        return "blake3"
+    return "sha256"
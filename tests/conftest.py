@@ -1,5 +1,6 @@
 import pytest
 
+from firmament.config import Config
 from firmament.encryptors.aes import AESEncryptor
 from firmament.encryptors.null import NullEncryptor
 
@@ -13,3 +14,22 @@ def null_encryptor():
 def aes_encryptor():
     # Use fewer iterations for faster tests
     return AESEncryptor("test-key", key_iterations=1000)
+
+
+@pytest.fixture
+def config(tmp_path):
+    """
+    Create a Config for an empty root with no backends.
+    """
+    (tmp_path / ".firmament").mkdir()
+    (tmp_path / ".firmament" / "config").write_text("backends: {}\n")
+    config = Config(tmp_path)
+    yield config
+    for datastore in (
+        config.local_versions,
+        config.file_versions,
+        config.path_requests,
+        config.content_backends,
+        config.hash_cache,
+    ):
+        datastore.close()
@@ -0,0 +1,27 @@
+import sys
+
+import pydantic
+import pytest
+
+from firmament.config import Config
+
+
+def write_config(root, content: str):
+    (root / ".firmament").mkdir()
+    (root / ".firmament" / "config").write_text(content)
+
+
+class TestConfig:
+    """
+    Tests for loading the config file.
+    """
+
+    def test_default_hash_algorithm(self, config):
+        assert config.hash_algorithm == "sha256"
+
+    def test_blake3_needs_package(self, tmp_path, monkeypatch):
+        # A None entry makes the import fail
+        monkeypatch.setitem(sys.modules, "blake3", None)
+        write_config(tmp_path, "backends: {}\nhash_algorithm: blake3\n")
+        with pytest.raises(pydantic.ValidationError, match="blake3"):
+            Config(tmp_path)
@@ -1,3 +1,6 @@
+import os
+
+import msgpack
 import pytest
 
 from firmament.constants import DELETED_CONTENT_HASH
@@ -5,6 +8,7 @@ from firmament.datastore import (
     ContentBackends,
     DiskDatastore,
     FileVersion,
+    HashCache,
     LocalVersion,
     PathRequest,
 )
@@ -20,6 +24,16 @@ def datastore(tmp_path):
     ds.close()
 
 
+@pytest.fixture
+def buffered_datastore(tmp_path):
+    """
+    Create a DiskDatastore that buffers writes.
+    """
+    ds = DiskDatastore[dict](tmp_path / "buffered-db", max_pending_bytes=1024)
+    yield ds
+    ds.close()
+
+
 @pytest.fixture
 def local_version(tmp_path):
     """
@@ -50,6 +64,16 @@ def path_request(tmp_path):
     ds.close()
 
 
+@pytest.fixture
+def hash_cache(tmp_path):
+    """
+    Create a HashCache datastore.
+    """
+    ds = HashCache(tmp_path / "hash-cache-db")
+    yield ds
+    ds.close()
+
+
 @pytest.fixture
 def content_backends(tmp_path):
     """
@@ -162,6 +186,27 @@ class TestDiskDatastoreIteration:
         datastore["b"] = {"v": 2}
         assert datastore.all() == {"a": {"v": 1}, "b": {"v": 2}}
 
+    def test_keyset(self, datastore):
+        datastore["a"] = {"v": 1}
+        datastore["b"] = {"v": 2}
+        assert datastore.keyset() == frozenset({"a", "b"})
+
+    def test_keyset_reflects_writes(self, datastore):
+        datastore["a"] = {"v": 1}
+        assert datastore.keyset() == {"a"}
+        datastore["b"] = {"v": 2}
+        assert datastore.keyset() == {"a", "b"}
+        del datastore["a"]
+        assert datastore.keyset() == {"b"}
+
+    def test_version_increases_on_write(self, datastore):
+        before = datastore.version()
+        datastore["a"] = {"v": 1}
+        assert datastore.version() > before
+        after = datastore.version()
+        assert datastore.get("a") == {"v": 1}
+        assert datastore.version() == after
+
     def test_keys_empty(self, datastore):
         assert list(datastore.keys()) == []
 
@@ -188,6 +233,27 @@ class TestDiskDatastoreBulkOperations:
         assert datastore["new1"] == {"v": 10}
         assert datastore["new2"] == {"v": 20}
 
+    def test_set_many(self, datastore):
+        datastore["keep"] = {"v": 0}
+        datastore["update"] = {"v": 1}
+
+        datastore.set_many({"update": {"v": 10}, "new": {"v": 20}})
+
+        assert datastore.all() == {
+            "keep": {"v": 0},
+            "update": {"v": 10},
+            "new": {"v": 20},
+        }
+
+    def test_delete_many(self, datastore):
+        datastore["a"] = {"v": 1}
+        datastore["b"] = {"v": 2}
+        datastore["c"] = {"v": 3}
+
+        datastore.delete_many(["a", "c", "missing"])
+
+        assert datastore.all() == {"b": {"v": 2}}
+
     def test_set_all_empty_clears_database(self, datastore):
         datastore["key1"] = {"v": 1}
         datastore["key2"] = {"v": 2}
@@ -196,6 +262,71 @@ class TestDiskDatastoreBulkOperations:
 
         assert len(datastore) == 0
 
+    def test_set_all_unsorted_input(self, datastore):
+        datastore.set_all({"c": {"v": 3}, "a": {"v": 1}, "b": {"v": 2}})
+
+        assert list(datastore.keys()) == ["a", "b", "c"]
+        assert datastore["b"] == {"v": 2}
+
+    def test_set_all_invalid_key_leaves_data(self, file_version):
+        file_version["/keep"] = {"hash1": {"mtime": 1000, "size": 1}}
+
+        with pytest.raises(ValueError):
+            file_version.set_all({"/new": {}, "invalid": {}})
+
+        assert list(file_version.keys()) == ["/keep"]
+
+
+class TestDiskDatastoreBufferedWrites:
+    """
+    Tests for write buffering (max_pending_bytes).
+    """
+
+    def test_buffered_write_not_committed(self, buffered_datastore):
+        before = buffered_datastore.env.stat()["entries"]
+        buffered_datastore["a"] = {"v": 1}
+        assert buffered_datastore.env.stat()["entries"] == before
+
+    def test_buffered_write_readable(self, buffered_datastore):
+        buffered_datastore["a"] = {"v": 1}
+        assert buffered_datastore["a"] == {"v": 1}
+        assert buffered_datastore.get("a") == {"v": 1}
+        assert "a" in buffered_datastore
+
+    def test_buffered_delete(self, buffered_datastore):
+        buffered_datastore["a"] = {"v": 1}
+        buffered_datastore.flush()
+        del buffered_datastore["a"]
+        assert "a" not in buffered_datastore
+        assert buffered_datastore.get("a") is None
+        with pytest.raises(KeyError):
+            del buffered_datastore["a"]
+
+    def test_iteration_sees_buffered_writes(self, buffered_datastore):
+        buffered_datastore["b"] = {"v": 2}
+        buffered_datastore["a"] = {"v": 1}
+        assert list(buffered_datastore.keys()) == ["a", "b"]
+        assert len(buffered_datastore) == 2
+
+    def test_flush_commits(self, buffered_datastore):
+        buffered_datastore["a"] = {"v": 1}
+        buffered_datastore.flush()
+        assert buffered_datastore.env.stat()["entries"] == 1
+
+    def test_flushes_when_threshold_reached(self, buffered_datastore):
+        for i in range(20):
+            buffered_datastore[f"key{i}"] = {"v": "x" * 100}
+        assert buffered_datastore.env.stat()["entries"] > 0
+
+    def test_close_flushes(self, tmp_path):
+        ds = DiskDatastore[dict](tmp_path / "db", max_pending_bytes=1024)
+        ds["a"] = {"v": 1}
+        ds.close()
+
+        ds = DiskDatastore[dict](tmp_path / "db")
+        assert ds["a"] == {"v": 1}
+        ds.close()
+
 
 class TestDiskDatastorePersistence:
     """
@@ -213,6 +344,24 @@ class TestDiskDatastorePersistence:
         assert ds2["key1"] == {"persistent": True}
         ds2.close()
 
+    def test_relaxed_durability_persists(self, tmp_path):
+        db_path = tmp_path / "relaxed-db"
+
+        ds1 = DiskDatastore[dict](db_path, durability="relaxed")
+        ds1["key1"] = {"persistent": True}
+        ds1.close()
+
+        ds2 = DiskDatastore[dict](db_path)
+        assert ds2["key1"] == {"persistent": True}
+        ds2.close()
+
+    def test_unknown_durability(self, tmp_path):
+        with pytest.raises(ValueError):
+            DiskDatastore[dict](
+                tmp_path / "db",
+                durability="sometimes",  # type: ignore[arg-type]
+            )
+
     def test_creates_directory_if_not_exists(self, tmp_path):
         db_path = tmp_path / "nested" / "path" / "db"
         ds = DiskDatastore[dict](db_path)
@@ -309,6 +458,25 @@ class TestLocalVersion:
         with pytest.raises(KeyError):
             local_version.by_content_hash("nonexistent")
 
+    def test_by_content_hash_reflects_writes(self, local_version):
+        local_version["/file1"] = {
+            "content_hash": "hash1",
+            "mtime": 1000,
+            "size": 100,
+            "last_hashed": 1000,
+        }
+        assert local_version.by_content_hash("hash1")[0] == "/file1"
+
+        local_version["/file1"] = {
+            "content_hash": "hash2",
+            "mtime": 2000,
+            "size": 100,
+            "last_hashed": 2000,
+        }
+        assert local_version.by_content_hash("hash2")[0] == "/file1"
+        with pytest.raises(KeyError):
+            local_version.by_content_hash("hash1")
+
     def test_all_content_hashes(self, local_version):
         local_version["/file1"] = {
             "content_hash": "hash1",
@@ -331,6 +499,45 @@ class TestLocalVersion:
 
         hashes = local_version.all_content_hashes()
         assert hashes == {"hash1", "hash2"}
+        assert local_version.all_content_hashes() is hashes
+
+        local_version["/file3"] = {
+            "content_hash": "hash3",
+            "mtime": 3000,
+            "size": 300,
+            "last_hashed": 3000,
+        }
+        assert local_version.all_content_hashes() == {"hash1", "hash2", "hash3"}
+
+    def test_set_hashed_skips_changed_entries(self, local_version):
+        for path in ["/same", "/newer", "/resized"]:
+            local_version[path] = {
+                "content_hash": None,
+                "mtime": 1000,
+                "size": 100,
+                "last_hashed": None,
+            }
+        local_version["/newer"] = {
+            "content_hash": None,
+            "mtime": 2000,
+            "size": 100,
+            "last_hashed": None,
+        }
+        local_version["/resized"] = {
+            "content_hash": None,
+            "mtime": 1000,
+            "size": 200,
+            "last_hashed": None,
+        }
+        hashed = {
+            path: {"content_hash": "abc", "mtime": 1000, "size": 100, "last_hashed": 1}
+            for path in ["/same", "/newer", "/resized", "/deleted"]
+        }
+        assert local_version.set_hashed(hashed) == 1
+        assert local_version["/same"]["content_hash"] == "abc"
+        assert local_version["/newer"]["content_hash"] is None
+        assert local_version["/resized"]["content_hash"] is None
+        assert "/deleted" not in local_version
 
     def test_without_content_hashes(self, local_version):
         local_version["/hashed"] = {
@@ -383,6 +590,19 @@ class TestLocalVersion:
         assert "/file2" in not_in_fv
         assert "/file3" not in not_in_fv  # No content_hash, so excluded
 
+    def test_not_in_file_versions_other_content(self, local_version, file_version):
+        local_version["/file1"] = {
+            "content_hash": "hash-new",
+            "mtime": 2000,
+            "size": 100,
+            "last_hashed": 2000,
+        }
+        file_version["/file1"] = {"hash-old": {"mtime": 1000, "size": 100}}
+
+        assert list(local_version.not_in_file_versions(file_version)) == [
+            ("/file1", local_version["/file1"])
+        ]
+
 
 class TestFileVersion:
     """
@@ -422,11 +642,63 @@ class TestFileVersion:
         assert content_hash == "new_hash"
         assert meta["mtime"] == 2000
 
+    def test_most_recent_content_tie(self, file_version):
+        file_version["/file"] = {
+            "first_hash": {"mtime": 1000, "size": 100},
+            "second_hash": {"mtime": 1000, "size": 200},
+        }
+
+        assert file_version.most_recent_content("/file")[0] == "first_hash"
+
     def test_most_recent_content_missing_path(self, file_version):
         content_hash, meta = file_version.most_recent_content("/nonexistent")
         assert content_hash is None
         assert meta is None
 
+    def test_most_recent_index(self, file_version):
+        file_version["/a"] = {
+            "old_hash": {"mtime": 1000, "size": 100},
+            "new_hash": {"mtime": 2000, "size": 200},
+        }
+        file_version["/b"] = {"hash1": {"mtime": 1000, "size": 100}}
+
+        index = file_version.most_recent_index()
+        assert list(index) == ["/a", "/b"]
+        assert index["/a"] == ("new_hash", {"mtime": 2000, "size": 200})
+
+        file_version.set_with_content("/b", "hash2", {"mtime": 3000, "size": 1})
+        assert file_version.most_recent_index()["/b"][0] == "hash2"
+
+    def test_index_paths_interned(self, file_version, local_version):
+        file_version.set_with_content("/a/b", "hash1", {"mtime": 1000, "size": 1})
+        local_version["/a/b"] = {
+            "content_hash": "hash1",
+            "mtime": 1000,
+            "size": 1,
+            "last_hashed": 1000,
+        }
+        (index_path,) = file_version.most_recent_index()
+        (local_path,) = local_version.keyset()
+        assert index_path is local_path
+
+    def test_paths_missing_locally(self, file_version, local_version):
+        for path in ["/a", "/b", "/b/c", "/d", "/e"]:
+            file_version.set_with_content(path, "hash1", {"mtime": 1000, "size": 1})
+        for path in ["/0", "/b", "/d", "/f"]:
+            local_version[path] = {
+                "content_hash": "hash1",
+                "mtime": 1000,
+                "size": 1,
+                "last_hashed": None,
+            }
+
+        missing = list(file_version.paths_missing_locally(local_version))
+        assert missing == ["/a", "/b/c", "/e"]
+
+    def test_paths_missing_locally_no_local_versions(self, file_version, local_version):
+        file_version.set_with_content("/a", "hash1", {"mtime": 1000, "size": 1})
+        assert list(file_version.paths_missing_locally(local_version)) == ["/a"]
+
     def test_deleted_paths(self, file_version):
         file_version["/active"] = {"hash1": {"mtime": 1000, "size": 100}}
         file_version["/deleted"] = {
@@ -468,6 +740,28 @@ class TestPathRequest:
     def test_resolve_status_default_on_demand(self, path_request):
         assert path_request.resolve_status("/unset/path") == "on-demand"
 
+    def test_resolve_status_reflects_changes(self, path_request):
+        path_request["/a"] = "full"
+        assert path_request.resolve_status("/a/b") == "full"
+
+        path_request["/a/b"] = "ignore"
+        assert path_request.resolve_status("/a/b") == "ignore"
+        assert path_request.resolve_status("/a/b/c") == "ignore"
+
+        del path_request["/a/b"]
+        assert path_request.resolve_status("/a/b/c") == "full"
+
+    def test_resolve_status_cache_bounded(self, path_request):
+        path_request.max_resolved_cache = 2
+        path_request["/a"] = "full"
+        for path in ["/a/1", "/a/2", "/a/3"]:
+            assert path_request.resolve_status(path) == "full"
+        assert len(path_request._resolved[1]) <= 2
+
+    def test_resolve_status_ignores_root(self, path_request):
+        path_request["/"] = "full"
+        assert path_request.resolve_status("/file") == "on-demand"
+
     def test_all_status_types(self, path_request):
         path_request["/full"] = "full"
         path_request["/on-demand"] = "on-demand"
@@ -493,6 +787,19 @@ class TestContentBackends:
         content_backends["hash123"] = []
         assert content_backends["hash123"] == []
 
+    def test_empty_backend_name(self, content_backends):
+        content_backends["hash1"] = [""]
+        content_backends["hash2"] = []
+        assert content_backends["hash1"] == [""]
+        assert content_backends["hash2"] == []
+        assert content_backends.backend_counts() == {"hash1": 1, "hash2": 0}
+
+    def test_names_that_look_like_msgpack(self, content_backends):
+        # U+0700 and U+0740 encode with 0xDC and 0xDD lead bytes
+        content_backends["hash1"] = ["\u0700", "\u0740-backup"]
+        assert content_backends["hash1"] == ["\u0700", "\u0740-backup"]
+        assert content_backends.backend_counts() == {"hash1": 2}
+
     def test_update_backend_list(self, content_backends):
         content_backends["hash123"] = ["local"]
         backends = content_backends["hash123"]
@@ -500,3 +807,92 @@ class TestContentBackends:
         content_backends["hash123"] = backends
 
         assert content_backends["hash123"] == ["local", "s3"]
+
+    def test_backend_counts(self, content_backends):
+        content_backends["hash1"] = ["local", "s3"]
+        content_backends["hash2"] = []
+        assert content_backends.backend_counts() == {"hash1": 2, "hash2": 0}
+
+        content_backends["hash2"] = ["local"]
+        assert content_backends.backend_counts()["hash2"] == 1
+
+    def test_reads_msgpack_values(self, content_backends):
+        """
+        Values written before the newline encoding are still readable.
+        """
+        with content_backends.env.begin(write=True) as txn:
+            txn.put(b"hash1", msgpack.packb(["local", "s3"]))
+            txn.put(b"hash2", msgpack.packb([]))
+        assert content_backends["hash1"] == ["local", "s3"]
+        assert content_backends["hash2"] == []
+        assert content_backends.backend_counts() == {"hash1": 2, "hash2": 0}
+
+
+class TestHashCache:
+    """
+    Tests for HashCache-specific functionality.
+    """
+
+    def test_hit_for_unchanged_file(self, hash_cache, tmp_path):
+        path = tmp_path / "file"
+        path.write_bytes(b"content")
+        hash_cache.set_hash(path.stat(), "hash1")
+        assert hash_cache.get_hash(path.stat()) == "hash1"
+
+    def test_miss_for_unknown_file(self, hash_cache, tmp_path):
+        path = tmp_path / "file"
+        path.write_bytes(b"content")
+        assert hash_cache.get_hash(path.stat()) is None
+
+    def test_survives_rename(self, hash_cache, tmp_path):
+        path = tmp_path / "file"
+        path.write_bytes(b"content")
+        hash_cache.set_hash(path.stat(), "hash1")
+        path = path.rename(tmp_path / "renamed")
+        assert hash_cache.get_hash(path.stat()) == "hash1"
+
+    def test_miss_after_mtime_change(self, hash_cache, tmp_path):
+        path = tmp_path / "file"
+        path.write_bytes(b"content")
+        stat_result = path.stat()
+        hash_cache.set_hash(stat_result, "hash1")
+        os.utime(path, ns=(stat_result.st_mtime_ns + 1, stat_result.st_mtime_ns + 1))
+        assert hash_cache.get_hash(path.stat()) is None
+
+    def test_miss_after_size_change(self, hash_cache, tmp_path):
+        path = tmp_path / "file"
+        path.write_bytes(b"content")
+        stat_result = path.stat()
+        hash_cache.set_hash(stat_result, "hash1")
+        path.write_bytes(b"longer content")
+        os.utime(path, ns=(stat_result.st_mtime_ns, stat_result.st_mtime_ns))
+        assert hash_cache.get_hash(path.stat()) is None
+
+    def test_miss_for_other_algorithm(self, hash_cache, tmp_path):
+        path = tmp_path / "file"
+        path.write_bytes(b"content")
+        hash_cache.set_hash(path.stat(), "hash1")
+        assert hash_cache.get_hash(path.stat(), "sha256") == "hash1"
+        assert hash_cache.get_hash(path.stat(), "blake3") is None
+        hash_cache.set_hash(path.stat(), "blake3:hash2")
+        assert hash_cache.get_hash(path.stat(), "sha256") is None
+        assert hash_cache.get_hash(path.stat(), "blake3") == "blake3:hash2"
+
+    def test_downloaded_hit_for_any_algorithm(self, hash_cache, tmp_path):
+        path = tmp_path / "file"
+        path.write_bytes(b"content")
+        hash_cache.set_hash(path.stat(), "hash1", downloaded=True)
+        assert hash_cache.get_hash(path.stat(), "sha256") == "hash1"
+        assert hash_cache.get_hash(path.stat(), "blake3") == "hash1"
+
+    def test_prune(self, hash_cache, tmp_path):
+        kept = tmp_path / "kept"
+        kept.write_bytes(b"content")
+        removed = tmp_path / "removed"
+        removed.write_bytes(b"other content")
+        hash_cache.set_hash(kept.stat(), "hash1")
+        hash_cache.set_hash(removed.stat(), "hash2")
+        removed_key = HashCache.stat_key(removed.stat())
+        hash_cache.prune({HashCache.stat_key(kept.stat())})
+        assert hash_cache.get_hash(kept.stat()) == "hash1"
+        assert removed_key not in hash_cache
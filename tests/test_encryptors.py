@@ -1,8 +1,9 @@
 import io
+import threading
 
 import pytest
 
-from firmament.encryptors.aes import AESEncryptor
+from firmament.encryptors.aes import AESEncryptor, _derive_key
 
 
 class TestNullEncryptor:
@@ -144,3 +145,48 @@ class TestAESEncryptor:
 
         with pytest.raises(Exception):
             encryptor2.decrypt_identifier(encrypted)
+
+    def test_key_derivation_cached(self):
+        """
+        A second encryptor with the same passphrase reuses the derived keys.
+        """
+        encryptor1 = AESEncryptor("key-cached", key_iterations=1000)
+        hits = _derive_key.cache_info().hits
+        encryptor2 = AESEncryptor("key-cached", key_iterations=1000)
+        assert _derive_key.cache_info().hits == hits + 2
+
+        encrypted = encryptor1.encrypt_identifier("shared-id")
+        assert encryptor2.decrypt_identifier(encrypted) == "shared-id"
+
+    def test_identifier_cache_bounded(self, aes_encryptor):
+        aes_encryptor.max_identifier_cache = 2
+        first = aes_encryptor.encrypt_identifier("one")
+        aes_encryptor.encrypt_identifier("two")
+        aes_encryptor.encrypt_identifier("three")
+        assert "one" not in aes_encryptor._identifier_cache
+        assert len(aes_encryptor._identifier_cache) == 2
+        # Evicted identifiers still encrypt the same way
+        assert aes_encryptor.encrypt_identifier("one") == first
+
+    def test_identifier_cache_threadsafe(self, aes_encryptor):
+        aes_encryptor.max_identifier_cache = 8
+        identifiers = [f"id-{i}" for i in range(200)]
+        expected = [aes_encryptor.encrypt_identifier(i) for i in identifiers]
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(5):
+                    assert [
+                        aes_encryptor.encrypt_identifier(i) for i in identifiers
+                    ] == expected
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert errors == []
+        assert len(aes_encryptor._identifier_cache) <= 8
@@ -1,6 +1,7 @@
 import io
+import os
+import queue
 import threading
-import time
 from pathlib import Path
 
 import pytest
@@ -8,6 +9,14 @@ import pytest
 from firmament.backends.base import VersionError
 from firmament.backends.local import LocalBackend
 
+# An mtime well in the past, for making sure a write will change a file's mtime
+PAST_MTIME_NS = 1_000_000_000_000_000_000
+
+# Large content to increase chance of interleaving without lock; bytes are
+# immutable, so these are shared rather than rebuilt each run
+LARGE_CONTENT_A = b"A" * 100000
+LARGE_CONTENT_B = b"B" * 100000
+
 
 @pytest.fixture
 def backend_root(tmp_path):
@@ -103,6 +112,24 @@ class TestLocalBackendBasicIO:
         assert result.getvalue() == content
 
 
+class TestLocalBackendContentPath:
+    """
+    Tests for where content is stored.
+    """
+
+    def test_shards_on_sha256_digest(self, local_backend, backend_root):
+        digest = "abcdef" + "0" * 58
+        assert local_backend.remote_content_path(digest) == str(
+            backend_root / "content" / "abc" / digest
+        )
+
+    def test_shards_after_algorithm_prefix(self, local_backend, backend_root):
+        content_hash = "blake3:abcdef" + "0" * 58
+        assert local_backend.remote_content_path(content_hash) == str(
+            backend_root / "content" / "abc" / content_hash
+        )
+
+
 class TestLocalBackendVersioning:
     """
     Tests for version-based optimistic concurrency control.
@@ -116,7 +143,7 @@ class TestLocalBackendVersioning:
         version = local_backend.remote_read_io(path, result)
 
         assert version is not None
-        assert version.isdigit()  # mtime_ns is numeric
+        assert int(version) > 0  # mtime_ns is a positive integer
 
     def test_write_with_correct_version_succeeds(self, local_backend, backend_root):
         path = str(backend_root / "test-file")
@@ -139,13 +166,13 @@ class TestLocalBackendVersioning:
     ):
         path = str(backend_root / "test-file")
         local_backend.remote_write_io(path, io.BytesIO(b"initial"))
+        # Backdate the file so the next write must change its mtime, however
+        # coarse the filesystem's timestamps are
+        os.utime(path, ns=(PAST_MTIME_NS, PAST_MTIME_NS))
 
         result = io.BytesIO()
         old_version = local_backend.remote_read_io(path, result)
 
-        # Ensure mtime changes
-        time.sleep(0.01)
-
         # Another writer updates the file
         local_backend.remote_write_io(path, io.BytesIO(b"other writer content"))
 
@@ -156,20 +183,20 @@ class TestLocalBackendVersioning:
             )
 
         # Content should remain as the other writer left it
-        result = io.BytesIO()
+        result.seek(0)
+        result.truncate()
         local_backend.remote_read_io(path, result)
         assert result.getvalue() == b"other writer content"
 
     def test_version_changes_after_write(self, local_backend, backend_root):
         path = str(backend_root / "test-file")
         local_backend.remote_write_io(path, io.BytesIO(b"initial"))
+        # Backdate rather than sleep past the filesystem's mtime resolution
+        os.utime(path, ns=(PAST_MTIME_NS, PAST_MTIME_NS))
 
         result = io.BytesIO()
         version1 = local_backend.remote_read_io(path, result)
 
-        # Small sleep to ensure mtime changes (filesystem resolution)
-        time.sleep(0.01)
-
         local_backend.remote_write_io(path, io.BytesIO(b"updated"))
 
         result = io.BytesIO()
@@ -178,9 +205,12 @@ class TestLocalBackendVersioning:
         assert version1 != version2
 
 
+@pytest.mark.timeout(2)
 class TestLocalBackendConcurrency:
     """
     Tests for concurrent access handling.
+
+    A deadlock here would hang, so each test is bounded by pytest-timeout.
     """
 
     def test_concurrent_writes_one_wins(self, local_backend, backend_root):
@@ -194,10 +224,10 @@ class TestLocalBackendConcurrency:
         version = local_backend.remote_read_io(path, result)
 
         results = {"success": 0, "version_error": 0}
-        barrier = threading.Barrier(2)
+        start = threading.Event()
 
         def writer(content: bytes):
-            barrier.wait()  # Synchronize start
+            start.wait()  # Synchronize start
             try:
                 local_backend.remote_write_io(
                     path, io.BytesIO(content), over_version=version
@@ -211,6 +241,7 @@ class TestLocalBackendConcurrency:
 
         t1.start()
         t2.start()
+        start.set()
         t1.join()
         t2.join()
 
@@ -233,16 +264,16 @@ class TestLocalBackendConcurrency:
         path = str(backend_root / "test-file")
         local_backend.remote_write_io(path, io.BytesIO(b"0"))
 
+        # All threads write over the same initial version
+        result = io.BytesIO()
+        version = local_backend.remote_read_io(path, result)
+
         results = {"success": 0, "version_error": 0}
         lock = threading.Lock()
-        barrier = threading.Barrier(3)
-
-        def writer(writer_id: int):
-            # All threads read the same initial version
-            result = io.BytesIO()
-            version = local_backend.remote_read_io(path, result)
+        start = threading.Event()
 
-            barrier.wait()  # Synchronize to maximize contention
+        def writer(writer_id: int, version: str):
+            start.wait()  # Synchronize to maximize contention
 
             try:
                 local_backend.remote_write_io(
@@ -256,10 +287,11 @@ class TestLocalBackendConcurrency:
                 with lock:
                     results["version_error"] += 1
 
-        threads = [threading.Thread(target=writer, args=(i,)) for i in range(3)]
+        threads = [threading.Thread(target=writer, args=(i, version)) for i in range(3)]
 
         for t in threads:
             t.start()
+        start.set()
         for t in threads:
             t.join()
 
@@ -289,7 +321,8 @@ class TestLocalBackendConcurrency:
             result = io.BytesIO()
             local_backend.remote_read_io(path, result)
             read_complete.set()
-            time.sleep(0.1)  # Hold the read "open"
+            # Hold the read "open" until the writer is done
+            write_complete.wait()
 
         def writer():
             read_complete.wait()  # Wait for reader to start
@@ -302,10 +335,8 @@ class TestLocalBackendConcurrency:
         reader_thread.start()
         writer_thread.start()
 
-        # Writer should complete within reasonable time
-        writer_thread.join(timeout=1.0)
-        assert write_complete.is_set(), "Writer should have completed"
-
+        # Writer should complete (within the test's timeout)
+        writer_thread.join()
         reader_thread.join()
 
     def test_flock_prevents_partial_writes(self, local_backend, backend_root):
@@ -318,16 +349,12 @@ class TestLocalBackendConcurrency:
         result = io.BytesIO()
         version = local_backend.remote_read_io(path, result)
 
-        # Create large content to increase chance of interleaving without lock
-        large_content_a = b"A" * 100000
-        large_content_b = b"B" * 100000
-
         results = []
 
         def writer_a():
             try:
                 local_backend.remote_write_io(
-                    path, io.BytesIO(large_content_a), over_version=version
+                    path, io.BytesIO(LARGE_CONTENT_A), over_version=version
                 )
                 results.append("A")
             except VersionError:
@@ -336,7 +363,7 @@ class TestLocalBackendConcurrency:
         def writer_b():
             try:
                 local_backend.remote_write_io(
-                    path, io.BytesIO(large_content_b), over_version=version
+                    path, io.BytesIO(LARGE_CONTENT_B), over_version=version
                 )
                 results.append("B")
             except VersionError:
@@ -350,13 +377,14 @@ class TestLocalBackendConcurrency:
         t1.join()
         t2.join()
 
-        # Read final content
-        result = io.BytesIO()
+        # Read final content, reusing the buffer from the first read
+        result.seek(0)
+        result.truncate()
         local_backend.remote_read_io(path, result)
         final_content = result.getvalue()
 
         # Content should be entirely A's or entirely B's, never mixed
-        assert final_content == large_content_a or final_content == large_content_b
+        assert final_content == LARGE_CONTENT_A or final_content == LARGE_CONTENT_B
 
 
 class TestLocalBackendFileVersionUpload:
@@ -397,51 +425,54 @@ class TestLocalBackendFileVersionUpload:
         assert "hash1" in result["/file"]
         assert "hash2" in result["/file"]
 
-    def test_file_version_upload_concurrent_after_initial(self, local_backend):
+    def test_file_version_upload_queued_after_initial(self, local_backend):
         """
-        Concurrent uploads after file exists should merge via retry.
+        File versions queued by several producer threads, then uploaded one at a time by
+        a single uploader thread, should all merge into the existing file.
 
-        Note: This test uses sequential uploads to avoid a race condition in
-        the implementation where concurrent first-writes (when db_version=None)
-        can corrupt the file since no locking is performed.
+        This does not run file_version_upload calls concurrently: remote_read_io reads
+        the database without taking the lock, so it can see a write in progress.
         """
         # Create initial file so version locking works for subsequent writes
         local_backend.file_version_upload(
             {"/initial": {"hash0": {"mtime": 0, "size": 0}}}
         )
 
-        # Use fewer uploaders with staggered starts to reduce contention
         num_uploaders = 3
+        uploads: queue.Queue[dict | None] = queue.Queue()
         completed = []
         errors = []
-        lock = threading.Lock()
 
-        def uploader(uploader_id: int):
-            try:
-                # Stagger starts slightly to reduce simultaneous contention
-                time.sleep(uploader_id * 0.01)
-                file_versions = {
+        def producer(uploader_id: int):
+            uploads.put(
+                {
                     f"/file-{uploader_id}": {
                         "hash123": {"mtime": 1000 + uploader_id, "size": 100}
                     }
                 }
-                local_backend.file_version_upload(file_versions)
-                with lock:
-                    completed.append(uploader_id)
-            except Exception as e:
-                with lock:
-                    errors.append((uploader_id, e))
+            )
 
-        threads = [
-            threading.Thread(target=uploader, args=(i,)) for i in range(num_uploaders)
+        def uploader():
+            while (file_versions := uploads.get()) is not None:
+                try:
+                    local_backend.file_version_upload(file_versions)
+                    completed.append(file_versions)
+                except Exception as e:
+                    errors.append((file_versions, e))
+
+        uploader_thread = threading.Thread(target=uploader)
+        uploader_thread.start()
+        producers = [
+            threading.Thread(target=producer, args=(i,)) for i in range(num_uploaders)
         ]
-
-        for t in threads:
+        for t in producers:
             t.start()
-        for t in threads:
+        for t in producers:
             t.join()
+        uploads.put(None)
+        uploader_thread.join()
 
-        # All uploaders should complete without errors
+        # All uploads should complete without errors
         assert not errors, f"Errors occurred: {errors}"
         assert len(completed) == num_uploaders
 
@@ -0,0 +1,106 @@
+import hashlib
+import os
+
+import pytest
+
+from firmament.backends.local import LocalBackend
+from firmament.operators.local_create import LocalCreateOperator
+from firmament.operators.local_hasher import LocalHasherOperator
+
+CONTENT = b"remote content"
+CONTENT_HASH = hashlib.sha256(CONTENT).hexdigest()
+
+
+@pytest.fixture
+def creator(config):
+    """
+    Create a LocalCreateOperator.
+    """
+    creator = LocalCreateOperator(config)
+    yield creator
+    creator.close()
+
+
+@pytest.fixture
+def backend(config, tmp_path_factory):
+    """
+    Add a LocalBackend holding CONTENT to the config.
+    """
+    source = tmp_path_factory.mktemp("source") / "file"
+    source.write_bytes(CONTENT)
+    backend = LocalBackend(root=str(tmp_path_factory.mktemp("backend")), name="test")
+    backend.content_upload(CONTENT_HASH, source)
+    config.backends["test"] = backend
+    config.path_requests["/dir"] = "full"
+    return backend
+
+
+class TestLocalCreate:
+    """
+    Tests for creating local files from FileVersions.
+    """
+
+    def test_downloads_file(self, creator, config, backend):
+        config.file_versions.set_with_content(
+            "/dir/file", CONTENT_HASH, {"mtime": 1000, "size": len(CONTENT)}
+        )
+        assert creator.step()
+        assert config.disk_path("/dir/file").read_bytes() == CONTENT
+        assert "/dir/file" in config.local_versions
+
+    def test_download_keeps_hash_under_other_algorithm(self, creator, config, backend):
+        config.file_versions.set_with_content(
+            "/dir/file", CONTENT_HASH, {"mtime": 1000, "size": len(CONTENT)}
+        )
+        assert creator.step()
+        config.hash_algorithm = "blake3"
+        assert LocalHasherOperator(config).step()
+        assert config.local_versions["/dir/file"]["content_hash"] == CONTENT_HASH
+
+    def test_skips_untracked_destination(self, creator, config, backend, monkeypatch):
+        config.file_versions.set_with_content(
+            "/dir", CONTENT_HASH, {"mtime": 1000, "size": len(CONTENT)}
+        )
+        config.disk_path("/dir").mkdir()
+        downloads = []
+        monkeypatch.setattr(backend, "content_download_io", downloads.append)
+        assert not creator.step()
+        assert not creator.step()
+        assert downloads == []
+        assert creator.conflicts == {"/dir"}
+        assert config.disk_path("/dir").is_dir()
+        assert "/dir" not in config.local_versions
+
+
+class TestLocalCreateDirfds:
+    """
+    Tests for LocalCreateOperator's cache of directory fds.
+    """
+
+    def test_reuses_fd(self, creator, config):
+        directory = config.root_path / "dir"
+        assert creator._dirfd(directory) == creator._dirfd(directory)
+
+    def test_replaced_directory_not_reused(self, creator, config):
+        directory = config.root_path / "dir"
+        os.close(creator._open_temporary(directory, "file")[1])
+        directory.rename(config.root_path / "moved")
+        directory.mkdir()
+        dirfd, fd = creator._open_temporary(directory, "file")
+        os.close(fd)
+        assert (directory / "file").exists()
+        assert os.fstat(dirfd).st_ino == directory.stat().st_ino
+
+    def test_evicted_fds_closed(self, creator, config):
+        creator.max_dirfds = 1
+        first = creator._dirfd(config.root_path / "a")
+        creator._dirfd(config.root_path / "b")
+        with pytest.raises(OSError):
+            os.fstat(first)
+
+    def test_close(self, creator, config):
+        dirfd = creator._dirfd(config.root_path / "dir")
+        creator.close()
+        assert not creator._dirfd_cache
+        with pytest.raises(OSError):
+            os.fstat(dirfd)
@@ -0,0 +1,104 @@
+import hashlib
+
+import pytest
+
+from firmament.operators import local_hasher
+from firmament.operators.local_hasher import LocalHasherOperator
+
+
+@pytest.fixture
+def hasher(config):
+    """
+    Create a LocalHasherOperator.
+    """
+    return LocalHasherOperator(config)
+
+
+def add_file(config, path: str, content: bytes):
+    """
+    Writes a file and records it as needing hashing.
+    """
+    disk_path = config.disk_path(path)
+    disk_path.write_bytes(content)
+    config.local_versions[path] = {
+        "content_hash": None,
+        "mtime": int(disk_path.stat().st_mtime),
+        "size": len(content),
+        "last_hashed": None,
+    }
+
+
+class TestLocalHasher:
+    """
+    Tests for LocalHasherOperator.
+    """
+
+    def test_hashes_files(self, hasher, config):
+        add_file(config, "/a", b"content a")
+        assert hasher.step()
+        assert (
+            config.local_versions["/a"]["content_hash"]
+            == hashlib.sha256(b"content a").hexdigest()
+        )
+        assert not hasher.step()
+
+    def test_skips_vanished_files(self, hasher, config):
+        add_file(config, "/a", b"content a")
+        add_file(config, "/b", b"content b")
+        add_file(config, "/c", b"content c")
+        config.disk_path("/b").unlink()
+        assert hasher.step()
+        assert config.local_versions["/a"]["content_hash"] is not None
+        assert config.local_versions["/b"]["content_hash"] is None
+        assert config.local_versions["/c"]["content_hash"] is not None
+
+    def test_keeps_batch_on_error(self, hasher, config, monkeypatch):
+        add_file(config, "/a", b"content a")
+        add_file(config, "/b", b"content b")
+        hash_file = local_hasher.hash_file
+
+        def failing_hash_file(fh, *args):
+            if fh.name.endswith("/b"):
+                raise OSError("read error")
+            return hash_file(fh, *args)
+
+        monkeypatch.setattr(local_hasher, "hash_file", failing_hash_file)
+        with pytest.raises(OSError):
+            hasher.step()
+        assert config.local_versions["/a"]["content_hash"] is not None
+        assert config.local_versions["/b"]["content_hash"] is None
+
+    def test_does_not_overwrite_newer_entry(self, hasher, config, monkeypatch):
+        add_file(config, "/a", b"content a")
+        add_file(config, "/b", b"content b")
+        hash_file = local_hasher.hash_file
+
+        def rescanning_hash_file(fh, *args):
+            # The scanner records a change to /a while /b is being hashed
+            if fh.name.endswith("/b"):
+                config.local_versions["/a"] = {
+                    "content_hash": None,
+                    "mtime": config.local_versions["/a"]["mtime"] + 10,
+                    "size": 100,
+                    "last_hashed": None,
+                }
+            return hash_file(fh, *args)
+
+        monkeypatch.setattr(local_hasher, "hash_file", rescanning_hash_file)
+        assert hasher.step()
+        assert config.local_versions["/a"]["content_hash"] is None
+        assert config.local_versions["/a"]["size"] == 100
+        assert config.local_versions["/b"]["content_hash"] is not None
+
+    def test_keeps_downloaded_hash(self, hasher, config):
+        """
+        Files downloaded under a hash keep it, even if we'd hash them differently.
+        """
+        add_file(config, "/a", b"content a")
+        sha256 = hashlib.sha256(b"content a").hexdigest()
+        config.hash_cache.set_hash(
+            config.disk_path("/a").stat(), sha256, downloaded=True
+        )
+        config.hash_algorithm = "blake3"
+        assert hasher.step()
+        assert config.local_versions["/a"]["content_hash"] == sha256
@@ -0,0 +1,66 @@
+import errno
+import os
+import threading
+import time
+
+import pytest
+
+from firmament.operators.local_scanner import LocalScannerOperator
+
+
+@pytest.fixture
+def scanner(config):
+    """
+    Create a LocalScannerOperator, skipping if inotify is unavailable.
+    """
+    scanner = LocalScannerOperator(config)
+    if scanner.inotify is None:
+        pytest.skip("inotify not available")
+    yield scanner
+    scanner.close()
+
+
+class TestLocalScannerInotify:
+    """
+    Tests for LocalScannerOperator's use of inotify.
+    """
+
+    def test_watch_limit_falls_back_to_polling(self, scanner, config, monkeypatch):
+        (config.root_path / "dir").mkdir()
+        (config.root_path / "dir" / "file").write_bytes(b"content")
+
+        def add_watch(directory):
+            raise OSError(errno.ENOSPC, "No space left on device", str(directory))
+
+        monkeypatch.setattr(scanner.inotify, "add_watch", add_watch)
+        assert scanner.step()
+        assert scanner.inotify is None
+        assert "/dir/file" in config.local_versions
+        # Later steps keep working, as full scans
+        (config.root_path / "dir" / "other").write_bytes(b"content")
+        assert scanner.step()
+        assert "/dir/other" in config.local_versions
+
+    def test_other_watch_errors_propagate(self, scanner, config, monkeypatch):
+        def add_watch(directory):
+            raise OSError(errno.EACCES, "Permission denied", str(directory))
+
+        monkeypatch.setattr(scanner.inotify, "add_watch", add_watch)
+        with pytest.raises(OSError):
+            scanner.step()
+
+    def test_stop_wakes_wait(self, scanner):
+        thread = threading.Thread(target=scanner.wait, args=(60,))
+        start = time.monotonic()
+        thread.start()
+        scanner.stop()
+        thread.join(5)
+        assert not thread.is_alive()
+        assert time.monotonic() - start < 5
+
+    def test_close(self, scanner):
+        inotify = scanner.inotify
+        scanner.close()
+        assert scanner.inotify is None
+        with pytest.raises(OSError):
+            os.fstat(inotify.fileno())
@@ -0,0 +1,61 @@
+import errno
+import os
+
+import pytest
+
+from firmament import osutil
+from firmament.osutil import rename_noreplace
+
+
+@pytest.fixture(params=["renameat2", "link", "rename"])
+def rename_method(request, monkeypatch):
+    """
+    Forces rename_noreplace down each of its code paths in turn.
+    """
+    if request.param == "renameat2":
+        if osutil._renameat2 is None:
+            pytest.skip("renameat2 not available")
+        return
+    monkeypatch.setattr(osutil, "_renameat2", None)
+    if request.param == "rename":
+
+        def link(*args, **kwargs):
+            raise OSError(errno.EPERM, "Operation not permitted")
+
+        monkeypatch.setattr(os, "link", link)
+
+
+class TestRenameNoreplace:
+    """
+    Tests for rename_noreplace.
+    """
+
+    def test_renames(self, rename_method, tmp_path):
+        (tmp_path / "src").write_bytes(b"content")
+        rename_noreplace(str(tmp_path / "src"), str(tmp_path / "dst"))
+        assert not (tmp_path / "src").exists()
+        assert (tmp_path / "dst").read_bytes() == b"content"
+
+    def test_renames_relative_to_dir_fds(self, rename_method, tmp_path):
+        (tmp_path / "src").write_bytes(b"content")
+        dirfd = os.open(tmp_path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            rename_noreplace("src", "dst", src_dir_fd=dirfd, dst_dir_fd=dirfd)
+        finally:
+            os.close(dirfd)
+        assert (tmp_path / "dst").read_bytes() == b"content"
+
+    def test_does_not_replace(self, rename_method, tmp_path):
+        (tmp_path / "src").write_bytes(b"new")
+        (tmp_path / "dst").write_bytes(b"old")
+        with pytest.raises(FileExistsError):
+            rename_noreplace(str(tmp_path / "src"), str(tmp_path / "dst"))
+        assert (tmp_path / "src").read_bytes() == b"new"
+        assert (tmp_path / "dst").read_bytes() == b"old"
+
+    def test_does_not_replace_directory(self, rename_method, tmp_path):
+        (tmp_path / "src").write_bytes(b"new")
+        (tmp_path / "dst").mkdir()
+        with pytest.raises(FileExistsError):
+            rename_noreplace(str(tmp_path / "src"), str(tmp_path / "dst"))
+        assert (tmp_path / "dst").is_dir()
@@ -1,13 +1,25 @@
+import functools
 import io
 import shutil
+import socket
 import subprocess
-from unittest.mock import MagicMock, patch
+import uuid
+from contextlib import ExitStack
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
 
 import pytest
 
+from firmament.backends import rclone_s3 as _rc_mod
+from firmament.backends import s3 as _s3_mod
 from firmament.backends.base import BackendError
 from firmament.backends.rclone_s3 import RcloneS3Backend
 
+# Remote configs shared by reference; the backend only ever reads them
+EMPTY_CONFIG: dict[str, str] = {}
+DRIVE_CONFIG = {"client_id": "test"}
+LOCAL_CONFIG = {"nounc": "true"}
+
 
 class MockProcess:
     """
@@ -38,40 +50,59 @@ class MockProcess:
 
 
 @pytest.fixture
-def mock_rclone_subprocess():
-    """
-    Patch subprocess.Popen for unit testing.
+def rclone_patches(tmp_path):
     """
-    with patch("firmament.backends.rclone_s3.subprocess.Popen") as mock_popen:
-        mock_process = MockProcess()
-        mock_popen.return_value = mock_process
-        yield {"popen": mock_popen, "process": mock_process}
-
+    Patch out everything RcloneS3Backend touches outside this process: the rclone
+    subprocess, the readiness socket, boto3, the temporary config file and port
+    selection.
 
-@pytest.fixture
-def mock_socket_connect():
-    """
-    Patch socket to simulate successful connection.
+    Returns a namespace of the mocks so tests can override individual ones.
     """
-    with patch("firmament.backends.rclone_s3.socket.socket") as mock_socket_class:
-        mock_socket = MagicMock()
-        mock_socket.__enter__ = MagicMock(return_value=mock_socket)
-        mock_socket.__exit__ = MagicMock(return_value=False)
+    with ExitStack() as stack:
+        # Spec'd mocks are built before the classes they copy are patched out.
+        # Poll returning None means the process is still running.
+        running_process = Mock(spec=subprocess.Popen)
+        running_process.poll.return_value = None
+        popen = stack.enter_context(patch.object(_rc_mod.subprocess, "Popen"))
+        process = MockProcess()
+        popen.return_value = process
+
+        mock_socket = Mock(spec=socket.socket)
+        # A spec'd Mock has no magic methods until they are assigned
+        mock_socket.__enter__ = Mock(return_value=mock_socket)
+        mock_socket.__exit__ = Mock(return_value=False)
         # Simulate successful connection
         mock_socket.connect.return_value = None
-        mock_socket_class.return_value = mock_socket
-        yield mock_socket_class
+        socket_class = stack.enter_context(patch.object(_rc_mod.socket, "socket"))
+        socket_class.return_value = mock_socket
 
+        boto3 = stack.enter_context(patch.object(_s3_mod, "boto3"))
+        client = Mock()
+        boto3.client.return_value = client
 
-@pytest.fixture
-def mock_boto3():
-    """
-    Patch boto3 for unit testing.
-    """
-    with patch("firmament.backends.s3.boto3") as mock:
-        client = MagicMock()
-        mock.client.return_value = client
-        yield {"boto3": mock, "client": client}
+        config_path = str(tmp_path / "test.conf")
+        stack.enter_context(
+            patch.object(_rc_mod.tempfile, "mkstemp", return_value=(5, config_path))
+        )
+        stack.enter_context(patch.object(_rc_mod.os, "write"))
+        stack.enter_context(patch.object(_rc_mod.os, "close"))
+        unlink = stack.enter_context(patch.object(_rc_mod.os, "unlink"))
+        stack.enter_context(patch.object(_rc_mod.os.path, "exists", return_value=True))
+        find_port = stack.enter_context(
+            patch.object(RcloneS3Backend, "_find_available_port", return_value=8080)
+        )
+
+        yield SimpleNamespace(
+            popen=popen,
+            process=process,
+            running_process=running_process,
+            socket=socket_class,
+            boto3=boto3,
+            client=client,
+            config_path=config_path,
+            unlink=unlink,
+            find_port=find_port,
+        )
 
 
 class TestRcloneS3BackendInit:
@@ -79,110 +110,70 @@ class TestRcloneS3BackendInit:
     Tests for RcloneS3Backend initialization.
     """
 
-    def test_config_file_generation(
-        self, mock_rclone_subprocess, mock_socket_connect, mock_boto3, tmp_path
-    ):
+    def test_config_file_generation(self, rclone_patches):
         """
         Should generate a temporary rclone config file.
         """
-        with (
-            patch("firmament.backends.rclone_s3.tempfile.mkstemp") as mock_mkstemp,
-            patch("firmament.backends.rclone_s3.os.write"),
-            patch("firmament.backends.rclone_s3.os.close"),
-        ):
-            config_path = str(tmp_path / "test.conf")
-            mock_mkstemp.return_value = (5, config_path)
-
-            backend = RcloneS3Backend(
-                name="test-backend",
-                rclone_remote_type="drive",
-                rclone_remote_config={
-                    "client_id": "test-client-id",
-                    "client_secret": "test-secret",
-                    "token": '{"access_token":"xxx"}',
-                },
-            )
+        backend = RcloneS3Backend(
+            name="test-backend",
+            rclone_remote_type="drive",
+            rclone_remote_config={
+                "client_id": "test-client-id",
+                "client_secret": "test-secret",
+                "token": '{"access_token":"xxx"}',
+            },
+        )
 
-            # Config file should be tracked
-            assert backend._config_path == config_path
-            backend.close()
+        # Config file should be tracked
+        assert backend._config_path == rclone_patches.config_path
+        backend.close()
 
-    def test_rclone_binary_not_found(self, mock_socket_connect, mock_boto3):
+    def test_rclone_binary_not_found(self, rclone_patches):
         """
         Should raise BackendError when rclone binary not found.
         """
-        with (
-            patch("firmament.backends.rclone_s3.subprocess.Popen") as mock_popen,
-            patch("firmament.backends.rclone_s3.tempfile.mkstemp") as m,
-        ):
-            m.return_value = (5, "/tmp/test.conf")
-            with (
-                patch("firmament.backends.rclone_s3.os.write"),
-                patch("firmament.backends.rclone_s3.os.close"),
-                patch("firmament.backends.rclone_s3.os.unlink"),
-            ):
-                mock_popen.side_effect = FileNotFoundError()
-
-                with pytest.raises(BackendError) as exc_info:
-                    RcloneS3Backend(
-                        name="test-backend",
-                        rclone_remote_type="drive",
-                        rclone_remote_config={},
-                    )
-
-                assert "rclone binary not found" in str(exc_info.value)
-
-    def test_rclone_process_crash_on_startup(self, mock_socket_connect, mock_boto3):
+        rclone_patches.popen.side_effect = FileNotFoundError()
+
+        with pytest.raises(BackendError) as exc_info:
+            RcloneS3Backend(
+                name="test-backend",
+                rclone_remote_type="drive",
+                rclone_remote_config=EMPTY_CONFIG,
+            )
+
+        assert "rclone binary not found" in str(exc_info.value)
+
+    def test_rclone_process_crash_on_startup(self, rclone_patches):
         """
         Should capture stderr when rclone exits unexpectedly.
         """
-        with (
-            patch("firmament.backends.rclone_s3.subprocess.Popen") as mock_popen,
-            patch("firmament.backends.rclone_s3.tempfile.mkstemp") as m,
-        ):
-            m.return_value = (5, "/tmp/test.conf")
-            with (
-                patch("firmament.backends.rclone_s3.os.write"),
-                patch("firmament.backends.rclone_s3.os.close"),
-                patch("firmament.backends.rclone_s3.os.unlink"),
-            ):
-                mock_process = MockProcess(
-                    returncode=1, stderr="Error: remote not found"
-                )
-                mock_popen.return_value = mock_process
-
-                with pytest.raises(BackendError) as exc_info:
-                    RcloneS3Backend(
-                        name="test-backend",
-                        rclone_remote_type="drive",
-                        rclone_remote_config={},
-                    )
-
-                assert "remote not found" in str(exc_info.value)
-
-    def test_auto_port_selection(
-        self, mock_rclone_subprocess, mock_socket_connect, mock_boto3
-    ):
+        rclone_patches.popen.return_value = MockProcess(
+            returncode=1, stderr="Error: remote not found"
+        )
+
+        with pytest.raises(BackendError) as exc_info:
+            RcloneS3Backend(
+                name="test-backend",
+                rclone_remote_type="drive",
+                rclone_remote_config=EMPTY_CONFIG,
+            )
+
+        assert "remote not found" in str(exc_info.value)
+
+    def test_auto_port_selection(self, rclone_patches):
         """
         Should auto-select an available port when none specified.
         """
-        with patch("firmament.backends.rclone_s3.tempfile.mkstemp") as m:
-            m.return_value = (5, "/tmp/test.conf")
-            with (
-                patch("firmament.backends.rclone_s3.os.write"),
-                patch("firmament.backends.rclone_s3.os.close"),
-                patch.object(
-                    RcloneS3Backend, "_find_available_port", return_value=54321
-                ),
-            ):
-                backend = RcloneS3Backend(
-                    name="test-backend",
-                    rclone_remote_type="local",
-                    rclone_remote_config={},
-                )
-
-                assert backend._port == 54321
-                backend.close()
+        rclone_patches.find_port.return_value = 54321
+
+        backend = RcloneS3Backend(
+            name="test-backend",
+            rclone_remote_type="local",
+            rclone_remote_config=EMPTY_CONFIG,
+        )
+
+        assert backend._port == 54321
+        backend.close()
 
 
 class TestRcloneS3BackendCommandBuilding:
@@ -190,92 +181,57 @@ class TestRcloneS3BackendCommandBuilding:
     Tests for rclone command construction.
     """
 
-    def test_basic_command(
-        self, mock_rclone_subprocess, mock_socket_connect, mock_boto3
-    ):
-        """
-        Should build correct basic command.
-        """
-        with patch("firmament.backends.rclone_s3.tempfile.mkstemp") as m:
-            m.return_value = (5, "/tmp/test.conf")
-            with (
-                patch("firmament.backends.rclone_s3.os.write"),
-                patch("firmament.backends.rclone_s3.os.close"),
-                patch.object(
-                    RcloneS3Backend, "_find_available_port", return_value=8080
-                ),
-            ):
-                backend = RcloneS3Backend(
-                    name="test-backend",
-                    rclone_remote_type="drive",
-                    rclone_remote_config={"client_id": "test"},
-                    remote_path="backups/firmament",
-                )
-
-                # Verify command was called correctly
-                call_args = mock_rclone_subprocess["popen"].call_args[0][0]
-                assert call_args[0] == "rclone"
-                assert call_args[1:3] == ["serve", "s3"]
-                assert "firmament:backups/firmament" in call_args
-                assert "--config" in call_args
-                assert "--addr" in call_args
-                assert "127.0.0.1:8080" in call_args
-                assert "--auth-key" in call_args
-
-                backend.close()
-
-    def test_extra_flags(self, mock_rclone_subprocess, mock_socket_connect, mock_boto3):
-        """
-        Should include extra rclone flags.
-        """
-        with patch("firmament.backends.rclone_s3.tempfile.mkstemp") as m:
-            m.return_value = (5, "/tmp/test.conf")
-            with (
-                patch("firmament.backends.rclone_s3.os.write"),
-                patch("firmament.backends.rclone_s3.os.close"),
-                patch.object(
-                    RcloneS3Backend, "_find_available_port", return_value=8080
-                ),
-            ):
-                backend = RcloneS3Backend(
-                    name="test-backend",
-                    rclone_remote_type="drive",
-                    rclone_remote_config={},
-                    extra_rclone_flags=["--vfs-cache-mode=full", "--verbose"],
-                )
-
-                call_args = mock_rclone_subprocess["popen"].call_args[0][0]
-                assert "--vfs-cache-mode=full" in call_args
-                assert "--verbose" in call_args
-
-                backend.close()
-
-    def test_custom_binary_path(
-        self, mock_rclone_subprocess, mock_socket_connect, mock_boto3
-    ):
+    @pytest.mark.parametrize(
+        "kwargs,expected_start,expected_args",
+        [
+            (
+                {
+                    "rclone_remote_type": "drive",
+                    "rclone_remote_config": DRIVE_CONFIG,
+                    "remote_path": "backups/firmament",
+                },
+                ["rclone", "serve", "s3"],
+                [
+                    "firmament:backups/firmament",
+                    "--config",
+                    "--addr",
+                    "127.0.0.1:8080",
+                    "--auth-key",
+                ],
+            ),
+            (
+                {
+                    "rclone_remote_type": "drive",
+                    "rclone_remote_config": EMPTY_CONFIG,
+                    "extra_rclone_flags": ["--vfs-cache-mode=full", "--verbose"],
+                },
+                ["rclone", "serve", "s3"],
+                ["--vfs-cache-mode=full", "--verbose"],
+            ),
+            (
+                {
+                    "rclone_remote_type": "local",
+                    "rclone_remote_config": EMPTY_CONFIG,
+                    "rclone_binary": "/usr/local/bin/rclone",
+                },
+                ["/usr/local/bin/rclone", "serve", "s3"],
+                [],
+            ),
+        ],
+        ids=["basic_command", "extra_flags", "custom_binary_path"],
+    )
+    def test_command(self, rclone_patches, kwargs, expected_start, expected_args):
         """
-        Should use custom rclone binary path.
+        Should build the rclone serve s3 command from the backend options.
         """
-        with patch("firmament.backends.rclone_s3.tempfile.mkstemp") as m:
-            m.return_value = (5, "/tmp/test.conf")
-            with (
-                patch("firmament.backends.rclone_s3.os.write"),
-                patch("firmament.backends.rclone_s3.os.close"),
-                patch.object(
-                    RcloneS3Backend, "_find_available_port", return_value=8080
-                ),
-            ):
-                backend = RcloneS3Backend(
-                    name="test-backend",
-                    rclone_remote_type="local",
-                    rclone_remote_config={},
-                    rclone_binary="/usr/local/bin/rclone",
-                )
-
-                call_args = mock_rclone_subprocess["popen"].call_args[0][0]
-                assert call_args[0] == "/usr/local/bin/rclone"
-
-                backend.close()
+        backend = RcloneS3Backend(name="test-backend", **kwargs)
+
+        call_args = rclone_patches.popen.call_args[0][0]
+        assert call_args[:3] == expected_start
+        for arg in expected_args:
+            assert arg in call_args
+
+        backend.close()
 
 
 class TestRcloneS3BackendBucketMapping:
@@ -283,58 +239,31 @@ class TestRcloneS3BackendBucketMapping:
     Tests for bucket name and prefix mapping.
     """
 
-    def test_bucket_from_remote_path(
-        self, mock_rclone_subprocess, mock_socket_connect, mock_boto3
-    ):
-        """
-        First path component should become bucket name.
-        """
-        with patch("firmament.backends.rclone_s3.tempfile.mkstemp") as m:
-            m.return_value = (5, "/tmp/test.conf")
-            with (
-                patch("firmament.backends.rclone_s3.os.write"),
-                patch("firmament.backends.rclone_s3.os.close"),
-                patch.object(
-                    RcloneS3Backend, "_find_available_port", return_value=8080
-                ),
-            ):
-                backend = RcloneS3Backend(
-                    name="test-backend",
-                    rclone_remote_type="local",
-                    rclone_remote_config={},
-                    remote_path="backups/firmament/data",
-                )
-
-                assert backend.bucket == "backups"
-                assert backend.prefix == "firmament/data"
-
-                backend.close()
-
-    def test_default_bucket_no_path(
-        self, mock_rclone_subprocess, mock_socket_connect, mock_boto3
-    ):
+    @pytest.mark.parametrize(
+        "remote_path,bucket,prefix",
+        [
+            # First path component should become bucket name
+            ("backups/firmament/data", "backups", "firmament/data"),
+            # Should use 'data' bucket when no remote_path
+            ("", "data", ""),
+        ],
+        ids=["bucket_from_remote_path", "default_bucket_no_path"],
+    )
+    def test_bucket_mapping(self, rclone_patches, remote_path, bucket, prefix):
         """
-        Should use 'data' bucket when no remote_path.
+        Should split remote_path into the served bucket and a key prefix.
         """
-        with patch("firmament.backends.rclone_s3.tempfile.mkstemp") as m:
-            m.return_value = (5, "/tmp/test.conf")
-            with (
-                patch("firmament.backends.rclone_s3.os.write"),
-                patch("firmament.backends.rclone_s3.os.close"),
-                patch.object(
-                    RcloneS3Backend, "_find_available_port", return_value=8080
-                ),
-            ):
-                backend = RcloneS3Backend(
-                    name="test-backend",
-                    rclone_remote_type="local",
-                    rclone_remote_config={},
-                )
-
-                assert backend.bucket == "data"
-                assert backend.prefix == ""
-
-                backend.close()
+        backend = RcloneS3Backend(
+            name="test-backend",
+            rclone_remote_type="local",
+            rclone_remote_config=EMPTY_CONFIG,
+            remote_path=remote_path,
+        )
+
+        assert backend.bucket == bucket
+        assert backend.prefix == prefix
+
+        backend.close()
 
 
 class TestRcloneS3BackendCleanup:
@@ -342,65 +271,42 @@ class TestRcloneS3BackendCleanup:
     Tests for subprocess cleanup.
     """
 
-    def test_close_terminates_process(
-        self, mock_rclone_subprocess, mock_socket_connect, mock_boto3
-    ):
+    def test_close_terminates_process(self, rclone_patches):
         """
         Close() should terminate the subprocess.
         """
-        with patch("firmament.backends.rclone_s3.tempfile.mkstemp") as m:
-            m.return_value = (5, "/tmp/test.conf")
-            with (
-                patch("firmament.backends.rclone_s3.os.write"),
-                patch("firmament.backends.rclone_s3.os.close"),
-                patch("firmament.backends.rclone_s3.os.path.exists", return_value=True),
-            ):
-                with patch("firmament.backends.rclone_s3.os.unlink") as mock_unlink:
-                    # Use MagicMock with poll returning None (process still running)
-                    mock_process = MagicMock()
-                    mock_process.poll.return_value = None
-                    mock_rclone_subprocess["popen"].return_value = mock_process
-
-                    backend = RcloneS3Backend(
-                        name="test-backend",
-                        rclone_remote_type="local",
-                        rclone_remote_config={},
-                    )
-
-                    backend.close()
-
-                    mock_process.terminate.assert_called_once()
-                    mock_unlink.assert_called()
-
-    def test_double_close_safe(
-        self, mock_rclone_subprocess, mock_socket_connect, mock_boto3
-    ):
+        mock_process = rclone_patches.running_process
+        rclone_patches.popen.return_value = mock_process
+
+        backend = RcloneS3Backend(
+            name="test-backend",
+            rclone_remote_type="local",
+            rclone_remote_config=EMPTY_CONFIG,
+        )
+
+        backend.close()
+
+        mock_process.terminate.assert_called_once()
+        rclone_patches.unlink.assert_called()
+
+    def test_double_close_safe(self, rclone_patches):
         """
         Calling close() twice should be safe.
         """
-        with patch("firmament.backends.rclone_s3.tempfile.mkstemp") as m:
-            m.return_value = (5, "/tmp/test.conf")
-            with (
-                patch("firmament.backends.rclone_s3.os.write"),
-                patch("firmament.backends.rclone_s3.os.close"),
-                patch("firmament.backends.rclone_s3.os.path.exists", return_value=True),
-            ):
-                with patch("firmament.backends.rclone_s3.os.unlink"):
-                    mock_process = MagicMock()
-                    mock_process.poll.return_value = None
-                    mock_rclone_subprocess["popen"].return_value = mock_process
-
-                    backend = RcloneS3Backend(
-                        name="test-backend",
-                        rclone_remote_type="local",
-                        rclone_remote_config={},
-                    )
-
-                    backend.close()
-                    backend.close()  # Should not raise
-
-                    # terminate should only be called once
-                    assert mock_process.terminate.call_count == 1
+        mock_process = rclone_patches.running_process
+        rclone_patches.popen.return_value = mock_process
+
+        backend = RcloneS3Backend(
+            name="test-backend",
+            rclone_remote_type="local",
+            rclone_remote_config=EMPTY_CONFIG,
+        )
+
+        backend.close()
+        backend.close()  # Should not raise
+
+        # terminate should only be called once
+        assert mock_process.terminate.call_count == 1
 
 
 class TestRcloneS3BackendStr:
@@ -408,48 +314,50 @@ class TestRcloneS3BackendStr:
     Tests for string representation.
     """
 
-    def test_str_with_path(
-        self, mock_rclone_subprocess, mock_socket_connect, mock_boto3
-    ):
+    def test_str_with_path(self, rclone_patches):
         """
         String should show remote type and path.
         """
-        with patch("firmament.backends.rclone_s3.tempfile.mkstemp") as m:
-            m.return_value = (5, "/tmp/test.conf")
-            with (
-                patch("firmament.backends.rclone_s3.os.write"),
-                patch("firmament.backends.rclone_s3.os.close"),
-                patch.object(
-                    RcloneS3Backend, "_find_available_port", return_value=8080
-                ),
-            ):
-                backend = RcloneS3Backend(
-                    name="test-backend",
-                    rclone_remote_type="drive",
-                    rclone_remote_config={},
-                    remote_path="backups/data",
-                )
-
-                result = str(backend)
-                assert "drive" in result
-                assert "backups/data" in result
-                assert "8080" in result
-
-                backend.close()
+        backend = RcloneS3Backend(
+            name="test-backend",
+            rclone_remote_type="drive",
+            rclone_remote_config=EMPTY_CONFIG,
+            remote_path="backups/data",
+        )
+
+        result = str(backend)
+        assert "drive" in result
+        assert "backups/data" in result
+        assert "8080" in result
+
+        backend.close()
 
 
 # Integration tests - require rclone to be installed
 
 
+@functools.lru_cache(maxsize=1)
+def _rclone_path() -> str | None:
+    """
+    Locate the rclone binary (once per session).
+    """
+    return shutil.which("rclone")
+
+
+@functools.lru_cache(maxsize=1)
 def _rclone_has_serve_s3() -> bool:
     """
     Check if rclone has serve s3 capability (requires v1.63+).
+
+    Cached, as every integration test asks and each check spawns rclone.
     """
     try:
         result = subprocess.run(
             ["rclone", "serve", "s3", "--help"],
-            capture_output=True,
-            text=True,
+            # Only the exit status matters, so don't pipe or decode any output
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
             timeout=5,
         )
         return result.returncode == 0
@@ -457,22 +365,25 @@ def _rclone_has_serve_s3() -> bool:
         return False
 
 
-@pytest.fixture
-def rclone_integration_backend(tmp_path):
+@pytest.fixture(scope="module")
+def rclone_integration_backend(tmp_path_factory):
     """
     Create RcloneS3Backend for integration testing using local filesystem.
 
     This uses rclone's 'local' backend to test without external dependencies. Requires
     rclone v1.63+ to be installed (for serve s3 support).
+
+    Module-scoped so a single rclone server serves every integration test; tests should
+    use rclone_test_key so they don't see each other's files.
     """
-    if not shutil.which("rclone"):
+    if not _rclone_path():
         pytest.skip("rclone not installed, skipping integration test")
 
     if not _rclone_has_serve_s3():
         pytest.skip("rclone serve s3 not available (requires rclone v1.63+)")
 
     # Create a temporary directory for the "remote"
-    remote_dir = tmp_path / "remote_storage"
+    remote_dir = tmp_path_factory.mktemp("rclone_integration") / "remote_storage"
     remote_dir.mkdir()
 
     # Create the bucket directory (required by rclone serve s3)
@@ -482,7 +393,7 @@ def rclone_integration_backend(tmp_path):
     backend = RcloneS3Backend(
         name="integration-test",
         rclone_remote_type="local",
-        rclone_remote_config={"nounc": "true"},
+        rclone_remote_config=LOCAL_CONFIG,
         remote_path=str(remote_dir / "testbucket"),
     )
 
@@ -491,32 +402,47 @@ def rclone_integration_backend(tmp_path):
     backend.close()
 
 
+@pytest.fixture
+def rclone_test_key(rclone_integration_backend):
+    """
+    Returns a remote path no other integration test uses.
+    """
+    return rclone_integration_backend.remote_database_path(f"test-{uuid.uuid4()}")
+
+
 @pytest.mark.integration
+@pytest.mark.xdist_group("rclone_integration")
 class TestRcloneS3BackendIntegration:
     """
     Integration tests that require rclone to be installed.
 
     Run with: pytest -m integration tests/test_rclone_s3_backend.py
+
+    Under pytest-xdist, pass --dist loadgroup so these all run on one worker and
+    share its single rclone server rather than each worker binding its own.
     """
 
-    def test_write_and_read_roundtrip(self, rclone_integration_backend):
+    def test_write_and_read_roundtrip(
+        self, rclone_integration_backend, rclone_test_key
+    ):
         """
         Test write/read roundtrip through rclone serve s3.
         """
         content = b"Hello, Rclone World!"
-        path = rclone_integration_backend.remote_database_path("test-file")
+        path = rclone_test_key
 
         rclone_integration_backend.remote_write_io(path, io.BytesIO(content))
 
-        result = io.BytesIO()
+        # Presized so the read overwrites in place rather than growing the buffer
+        result = io.BytesIO(bytes(len(content)))
         rclone_integration_backend.remote_read_io(path, result)
         assert result.getvalue() == content
 
-    def test_exists_and_delete(self, rclone_integration_backend):
+    def test_exists_and_delete(self, rclone_integration_backend, rclone_test_key):
         """
         Test exists and delete operations.
         """
-        path = rclone_integration_backend.remote_database_path("exists-test")
+        path = rclone_test_key
 
         # Should not exist initially
         assert rclone_integration_backend.remote_exists(path) is False
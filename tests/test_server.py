@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+from firmament.operators.base import BaseOperator
+from firmament.server import Server
+
+
+class RecordingOperator(BaseOperator):
+    """
+    An operator that records what happens to it, optionally blocking in step().
+    """
+
+    log_name = "recording"
+    threaded = True
+    interval_short = 60
+    interval_long = 60
+
+    def __init__(self, config, release: threading.Event | None = None):
+        super().__init__(config)
+        self.release = release
+        self.stepped = threading.Event()
+        self.closed = False
+
+    def step(self) -> bool:
+        self.stepped.set()
+        if self.release is not None:
+            self.release.wait()
+        return True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def server(config):
+    """
+    Create a Server with a short shutdown timeout.
+    """
+    server = Server(config)
+    server.shutdown_timeout = 0.5
+    return server
+
+
+class TestServerShutdown:
+    """
+    Tests for stopping operators when the server exits.
+    """
+
+    @pytest.mark.timeout(10)
+    def test_waiting_operators_stopped_and_closed(self, server, config):
+        threaded = RecordingOperator(config)
+        scheduled = RecordingOperator(config)
+        threaded.start()
+        # Now waiting out its 60 second interval
+        threaded.stepped.wait()
+        server.shutdown([threaded], [scheduled])
+        assert not threaded.is_alive()
+        assert threaded.closed
+        assert scheduled.closed
+
+    @pytest.mark.timeout(10)
+    def test_busy_operator_not_closed(self, server, config):
+        release = threading.Event()
+        threaded = RecordingOperator(config, release)
+        threaded.start()
+        threaded.stepped.wait()
+        server.shutdown([threaded], [])
+        assert threaded.is_alive()
+        assert not threaded.closed
+        release.set()
+        threaded.join()
@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+
+from firmament.tui.app import FirmamentTUI
+from firmament.tui.tree import FileStatus, build_tree
+
+
+@pytest.fixture
+def tree_config(config):
+    """
+    Create a Config with a few synced files in two directories.
+    """
+    for path in ("/a/one", "/a/two", "/b/three"):
+        config.file_versions.set_with_content(
+            path, "hash" + path.replace("/", "-"), {"mtime": 1, "size": 1}
+        )
+    return config
+
+
+class TestBuildTree:
+    """
+    Tests for build_tree's reuse of unchanged nodes between builds.
+    """
+
+    def test_unchanged_build_reuses_files(self, tree_config):
+        old = build_tree(tree_config)
+        new = build_tree(tree_config, old)
+        assert new.nodes.keys() == old.nodes.keys()
+        for path in ("/a/one", "/a/two", "/b/three"):
+            assert new.nodes[path] is old.nodes[path]
+        # Directories are always rebuilt, pointing at the reused files
+        assert new.nodes["/a"] is not old.nodes["/a"]
+        assert new.nodes["/a"].children["one"] is old.nodes["/a/one"]
+        assert new.nodes["/a"].sorted_children == old.nodes["/a"].sorted_children
+
+    def test_changed_files_are_replaced(self, tree_config):
+        old = build_tree(tree_config)
+        tree_config.local_versions.set(
+            "/a/one",
+            {"content_hash": "hash-a-one", "mtime": 1, "size": 1, "last_hashed": 1},
+        )
+        new = build_tree(tree_config, old)
+        assert new.nodes["/a/one"] is not old.nodes["/a/one"]
+        assert new.nodes["/a/one"].status == FileStatus.LOCAL
+        assert new.nodes["/a/two"] is old.nodes["/a/two"]
+        assert new.nodes["/b/three"] is old.nodes["/b/three"]
+
+    def test_inherited_request_change_replaces_subtree(self, tree_config):
+        old = build_tree(tree_config)
+        tree_config.path_requests.set("/b", "ignore")
+        new = build_tree(tree_config, old)
+        assert new.nodes["/b/three"] is not old.nodes["/b/three"]
+        assert new.nodes["/b/three"].effective_path_request == "ignore"
+        assert new.nodes["/a/one"] is old.nodes["/a/one"]
+
+    def test_added_and_removed_files(self, tree_config):
+        old = build_tree(tree_config)
+        tree_config.file_versions.delete("/b/three")
+        tree_config.file_versions.set_with_content(
+            "/a/four", "hash-a-four", {"mtime": 1, "size": 1}
+        )
+        new = build_tree(tree_config, old)
+        assert "/b/three" not in new.nodes
+        assert "/b" not in new.nodes
+        assert [child.name for child in new.nodes["/a"].sorted_children] == [
+            "four",
+            "one",
+            "two",
+        ]
+        assert new.nodes["/a/one"] is old.nodes["/a/one"]
+
+
+class TestDiffApply:
+    """
+    Tests for FirmamentTUI applying rebuilt trees to the tree widget.
+    """
+
+    def run(self, config, test):
+        """
+        Run the async test function against a headless FirmamentTUI.
+        """
+
+        async def runner():
+            app = FirmamentTUI(config)
+            async with app.run_test() as pilot:
+                await test(app, pilot)
+
+        asyncio.run(runner())
+
+    def test_refresh_keeps_unchanged_nodes(self, tree_config):
+        async def test(app, pilot):
+            index = app._node_index
+            app._node_index["/a"].expand()
+            await pilot.pause()
+            one, two = index["/a/one"], index["/a/two"]
+            three_data = app._last_snapshot.nodes["/b/three"]
+            tree_config.local_versions.set(
+                "/a/one",
+                {"content_hash": "h", "mtime": 1, "size": 1, "last_hashed": 1},
+            )
+            app.refresh_tree()
+            # Widget nodes are kept, with only the changed one given new data
+            assert index["/a/one"] is one
+            assert index["/a/two"] is two
+            assert one.data.status == FileStatus.LOCAL
+            assert two.data is app._last_snapshot.nodes["/a/two"]
+            assert app._last_snapshot.nodes["/b/three"] is three_data
+
+        self.run(tree_config, test)
+
+    def test_refresh_inserts_in_order_and_removes(self, tree_config):
+        async def test(app, pilot):
+            app._node_index["/a"].expand()
+            await pilot.pause()
+            tree_config.file_versions.set_with_content(
+                "/a/four", "hash-a-four", {"mtime": 1, "size": 1}
+            )
+            tree_config.file_versions.delete("/a/two")
+            app.refresh_tree()
+            children = app._node_index["/a"].children
+            assert [child.data.name for child in children] == ["four", "one"]
+            assert "/a/two" not in app._node_index
+
+        self.run(tree_config, test)
+
+    def test_unloaded_directories_populate_on_expand(self, tree_config):
+        async def test(app, pilot):
+            # /b has not been expanded, so its children are not in the widget
+            assert "/b" not in app._loaded_paths
+            assert "/b/three" not in app._node_index
+            tree_config.file_versions.set_with_content(
+                "/b/five", "hash-b-five", {"mtime": 1, "size": 1}
+            )
+            app.refresh_tree()
+            assert "/b/five" not in app._node_index
+            app._node_index["/b"].expand()
+            await pilot.pause()
+            children = app._node_index["/b"].children
+            assert [child.data.name for child in children] == ["five", "three"]
+
+        self.run(tree_config, test)
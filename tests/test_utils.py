@@ -0,0 +1,55 @@
+import hashlib
+
+import pytest
+
+from firmament.utils import hash_algorithm_of, hash_file
+
+CONTENT = b"Hello, World!" * 1000
+
+
+@pytest.fixture
+def content_path(tmp_path):
+    """
+    Create a file with known content.
+    """
+    path = tmp_path / "file"
+    path.write_bytes(CONTENT)
+    return path
+
+
+class TestHashFile:
+    """
+    Tests for hash_file.
+    """
+
+    @pytest.mark.parametrize("buffer_size", [None, 7, 1024 * 1024])
+    def test_sha256(self, content_path, buffer_size):
+        buffer = None if buffer_size is None else bytearray(buffer_size)
+        with open(content_path, "rb") as fh:
+            content_hash = hash_file(fh, "sha256", buffer)
+        assert content_hash == hashlib.sha256(CONTENT).hexdigest()
+        assert hash_algorithm_of(content_hash) == "sha256"
+
+    @pytest.mark.parametrize("buffer_size", [None, 7])
+    def test_blake3(self, content_path, buffer_size):
+        blake3 = pytest.importorskip("blake3")
+        buffer = None if buffer_size is None else bytearray(buffer_size)
+        with open(content_path, "rb") as fh:
+            content_hash = hash_file(fh, "blake3", buffer)
+        assert content_hash == f"blake3:{blake3.blake3(CONTENT).hexdigest()}"
+        assert hash_algorithm_of(content_hash) == "blake3"
+
+    @pytest.mark.parametrize("algorithm", ["sha256", "blake3"])
+    def test_empty_file(self, tmp_path, algorithm):
+        if algorithm == "blake3":
+            pytest.importorskip("blake3")
+        path = tmp_path / "empty"
+        path.write_bytes(b"")
+        with open(path, "rb") as fh:
+            content_hash = hash_file(fh, algorithm, bytearray(16))
+        assert content_hash.startswith("blake3:") == (algorithm == "blake3")
+
+    def test_unknown_algorithm(self, content_path):
+        with open(content_path, "rb") as fh:
+            with pytest.raises(ValueError):
+                hash_file(fh, "md5")  # type: ignore[arg-type]